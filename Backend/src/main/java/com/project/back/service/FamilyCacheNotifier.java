@@ -0,0 +1,65 @@
+package com.project.back.service;
+//가족 관계가 바뀌면 FastAPI 서버의 가족 캐시를 무효화하도록 알림
+
+import java.time.Duration;
+import java.util.List;
+import java.util.Map;
+import java.util.concurrent.CompletableFuture;
+
+import org.springframework.beans.factory.annotation.Value;
+import org.springframework.boot.web.client.RestTemplateBuilder;
+import org.springframework.http.HttpEntity;
+import org.springframework.http.HttpHeaders;
+import org.springframework.http.MediaType;
+import org.springframework.stereotype.Component;
+import org.springframework.transaction.support.TransactionSynchronization;
+import org.springframework.transaction.support.TransactionSynchronizationManager;
+import org.springframework.web.client.RestTemplate;
+
+@Component
+public class FamilyCacheNotifier {
+
+    private final RestTemplate restTemplate;
+    private final String invalidateUrl;
+    private final String internalApiKey;
+
+    public FamilyCacheNotifier(RestTemplateBuilder builder,
+                               @Value("${kairos.fastapi-url:http://localhost:8000}") String fastapiUrl,
+                               @Value("${kairos.internal-api-key:}") String internalApiKey) {
+        this.restTemplate = builder
+                .setConnectTimeout(Duration.ofSeconds(2))
+                .setReadTimeout(Duration.ofSeconds(2))
+                .build();
+        this.invalidateUrl = fastapiUrl + "/family/invalidate";
+        this.internalApiKey = internalApiKey;
+    }
+
+    //트랜잭션이 커밋된 뒤에 알림을 보냄 (롤백되면 보내지 않음)
+    //알림이 실패해도 FastAPI 쪽 캐시는 TTL이 지나면 다시 조회하므로 요청은 실패시키지 않음
+    public void familyChanged(Long... userIds) {
+        List<Long> ids = List.of(userIds);
+        if (TransactionSynchronizationManager.isSynchronizationActive()) {
+            TransactionSynchronizationManager.registerSynchronization(new TransactionSynchronization() {
+                @Override
+                public void afterCommit() {
+                    sendAsync(ids);
+                }
+            });
+        } else {
+            sendAsync(ids);
+        }
+    }
+
+    private void sendAsync(List<Long> userIds) {
+        CompletableFuture.runAsync(() -> {
+            try {
+                HttpHeaders headers = new HttpHeaders();
+                headers.setContentType(MediaType.APPLICATION_JSON);
+                headers.set("X-Internal-Key", internalApiKey);
+                restTemplate.postForEntity(invalidateUrl, new HttpEntity<>(Map.of("user_ids", userIds), headers), String.class);
+            } catch (Exception e) {
+                System.out.println("가족 캐시 무효화 알림 실패: " + e.getMessage());
+            }
+        });
+    }
+}
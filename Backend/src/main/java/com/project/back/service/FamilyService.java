@@ -18,6 +18,7 @@ public class FamilyService {
     private final FamilyRequestRepository familyRequestRepository;
     private final FamilyshipRepository familyshipRepository;
     private final UserRepository userRepository;
+    private final FamilyCacheNotifier familyCacheNotifier;
 
     // 가족 요청 보내기
     public FamilyRequest sendFamilyRequest(Long senderId, Long receiverId){
@@ -59,6 +60,9 @@ public class FamilyService {
 
         // 요청을 삭제하려면 아래 주석을 해제하세요
         familyRequestRepository.delete(request);
+
+        // FastAPI 서버의 가족 캐시 무효화 (커밋 후 전송)
+        familyCacheNotifier.familyChanged(sender.getId(), receiver.getId());
     }
 
     // 가족 요청 거절
@@ -171,5 +175,8 @@ public class FamilyService {
         List<Familyship> familyshipsToDelete = familyshipRepository.findByUser1Id(memberId);
         familyshipsToDelete.addAll(familyshipRepository.findByUser2Id(memberId));
         familyshipRepository.deleteAll(familyshipsToDelete);
+
+        // FastAPI 서버의 가족 캐시 무효화 (커밋 후 전송)
+        familyCacheNotifier.familyChanged(currentUserId, memberId);
     }
 }
@@ -1,30 +1,39 @@
 import asyncio
 import logging
+from datetime import datetime, timedelta
 import os
 import json
+from typing import Optional
 from fastapi.responses import FileResponse
 import uvicorn  # uvicorn 모듈 임포트 추가
 
-from fastapi import FastAPI, Request, HTTPException, Header, WebSocket
+from fastapi import FastAPI, Request, HTTPException, Header, WebSocket, Depends
 from fastapi.templating import Jinja2Templates
 from starlette.middleware.cors import CORSMiddleware
 from starlette.responses import HTMLResponse, StreamingResponse
 
-from face_recognition import recognize_periodically
+from face_recognition import recognize_periodically, inference_pool, scheduler_stats_snapshot
 from video_processing import generate_frames, video_frame_generator
-from mqtt_client import setup_mqtt, distance_data, move, speed, text_to_speech, video_frames
+from mqtt_client import setup_mqtt, distance_data, move, speed, text_to_speech
 from db_face_loader import load_faces_from_db
 from hand_gesture_recognition import init as init_hand_gesture, recognize_hand_gesture_periodically
 
 from face_recognition import recognize_periodically
 from video_processing import generate_frames, video_frame_generator
-from mqtt_client import setup_mqtt, distance_data, move, speed, video_frames
+from mqtt_client import setup_mqtt, distance_data, move, speed
 from db_face_loader import load_faces_from_db
-from s3_uploader import list_s3_videos
+from highlight_catalog import DEFAULT_PAGE_SIZE as DEFAULT_VIDEO_PAGE_SIZE
+from s3_uploader import list_s3_videos, upload_queue, reconcile_catalog, CATALOG_RECONCILE_INTERVAL
 from calendar_app import get_all_schedules, add_schedules, delete_schedule, Schedule
-from emotion_record import get_most_emotion_pic_path, get_most_frequent_emotion
-from face_image_db import current_userId, fetch_family_photos
-from message_server import handle_connection, fetch_user_id_by_username
+from emotion_record import get_most_emotion_pic_path, get_most_frequent_emotion, emotion_aggregator, emotion_series
+from face_image_db import fetch_family_photos
+from message_server import handle_connection, fetch_user_id_by_username, get_family
+from message_store import message_store, family_group_key, migrate_legacy_logs, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from db_pool import db_pool
+from auth import AuthUser, get_current_user, token_cache
+from family_cache import family_cache, FamilyInvalidation, INTERNAL_API_KEY
+
+MAX_HISTORY_DAYS = 30  # /emotion_history 최대 조회 기간 (분 단위 원본 보관 기간과 같음)
 
 # Logging 설정
 logging.basicConfig(level=logging.INFO)
@@ -43,14 +52,35 @@ app.add_middleware(
 
 @app.on_event("startup")
 async def startup_event():
+    # 예전 {user_id}_messages.json 채팅 기록을 메시지 저장소로 옮김 (이미 옮겼으면 바로 반환)
+    await asyncio.get_running_loop().run_in_executor(None, migrate_legacy_logs)
     await setup_mqtt()
     asyncio.create_task(recognize_periodically())
-    load_faces_from_db()  # 얼굴 이미지 로드
+    # 재시작 전에 끝나지 않은 하이라이트 업로드를 이어서 진행
+    upload_queue.start()
+    asyncio.create_task(reconcile_catalog_periodically())
+    # 얼굴 이미지 동기화는 블로킹 작업이므로 이벤트 루프 밖에서 실행
+    asyncio.get_running_loop().run_in_executor(None, load_faces_from_db)
     if init_hand_gesture():
         asyncio.create_task(recognize_hand_gesture_periodically())
     else:
         logger.error("손동작 인식 초기화 실패")
 
+async def reconcile_catalog_periodically():
+    """하이라이트 목록을 주기적으로 S3 전체 목록과 맞춤 (다른 경로로 추가/삭제된 영상 반영)"""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            await loop.run_in_executor(None, reconcile_catalog)
+        except Exception as e:
+            logger.error(f"하이라이트 목록 동기화 중 오류 발생: {e}")
+        await asyncio.sleep(CATALOG_RECONCILE_INTERVAL)
+
+@app.on_event("shutdown")
+def shutdown_event():
+    # 아직 파일에 기록되지 않은 감정 집계를 저장
+    emotion_aggregator.flush()
+
 @app.get("/", response_class=HTMLResponse)
 async def read_index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
@@ -74,6 +104,31 @@ async def get_distance():
     logger.info("get_distance 엔드포인트 호출됨.")
     return {"distance": distance_data}
 
+@app.get("/inference_stats")
+async def get_inference_stats():
+    """
+    추론 워커 큐 길이와 단계별(detect/recognize/emotion) 소요 시간,
+    움직임 감지/검출 스케줄링과 얼굴 트랙 상태를 반환하는 엔드포인트
+    """
+    return {**inference_pool.stats(), "scheduler": scheduler_stats_snapshot()}
+
+@app.get("/db_stats")
+async def get_db_stats():
+    """
+    DB 커넥션 풀 상태와 쿼리별 소요 시간을 반환하는 엔드포인트
+    """
+    return {**db_pool.stats(), "family_cache": family_cache.stats(), "token_cache": token_cache.stats()}
+
+@app.post("/family/invalidate")
+async def invalidate_family(body: FamilyInvalidation, x_internal_key: Optional[str] = Header(None)):
+    """
+    Spring 백엔드가 가족을 추가/삭제한 뒤 호출하는 가족 캐시 무효화 엔드포인트
+    """
+    if INTERNAL_API_KEY is None or x_internal_key != INTERNAL_API_KEY:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    family_cache.invalidate(body.user_ids)
+    return {"message": "invalidated", "user_ids": body.user_ids}
+
 @app.get("/video")
 async def video_stream():
     return StreamingResponse(generate_frames(), media_type='multipart/x-mixed-replace; boundary=frame')
@@ -85,61 +140,95 @@ async def get_video_feed(face: bool, hand: bool):
                              media_type='multipart/x-mixed-replace; boundary=frame')
 
 @app.get("/calendar")
-def calendar(token: str = Header(...)):
-    schedules = get_all_schedules(token)
+def calendar(user: AuthUser = Depends(get_current_user)):
+    schedules = get_all_schedules(user)
     return {"schedules": schedules}
 
 @app.post("/schedules/add")
-def add_schedule_endpoint(schedule: Schedule, token: str = Header(...)):
-    return add_schedules(schedule, token)
+def add_schedule_endpoint(schedule: Schedule, user: AuthUser = Depends(get_current_user)):
+    return add_schedules(schedule, user)
 
 @app.delete("/schedules/{schedule_id}")
 def delete_schedule_endpoint(
         schedule_id: int,
-        token: str = Header(...)
+        user: AuthUser = Depends(get_current_user)
 ):
     try:
-        return delete_schedule(schedule_id, token)
+        return delete_schedule(schedule_id, user)
     except HTTPException as e:
         raise e  # 발생한 HTTPException을 그대로 재발생
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @app.get("/most_emotion")
-async def most_emotion(token: str = Header(...)):
-    user_id = await current_userId(token)  # 비동기 함수 호출로 user_id 추출
-    logging.info(user_id)
-    most_frequent_emotion = get_most_frequent_emotion(user_id)  # user_id로 감정 데이터 가져오기
+async def most_emotion(user: AuthUser = Depends(get_current_user)):
+    logging.info(user.username)
+    most_frequent_emotion = get_most_frequent_emotion(user.username)  # username으로 감정 데이터 가져오기
     if most_frequent_emotion is None:
         raise HTTPException(status_code=404, detail="Emotion data not found.")
     return {"most_frequent_emotion": most_frequent_emotion}
 
+@app.get("/emotion_today")
+async def emotion_today(user: AuthUser = Depends(get_current_user)):
+    """
+    오늘의 감정 집계 (일/시간 버킷과 최다 감정)를 반환하는 엔드포인트
+    """
+    return emotion_aggregator.summary(user.username)
+
+@app.get("/emotion_history")
+async def emotion_history(days: int = 7, resolution: str = "hour", user: AuthUser = Depends(get_current_user)):
+    """
+    최근 days일의 감정 감지 횟수를 resolution(minute/hour/day) 단위로 반환하는 엔드포인트
+    - days는 1..MAX_HISTORY_DAYS 범위로 맞춤 (분 단위는 하루까지만 허용)
+    """
+    days = max(1, min(days, MAX_HISTORY_DAYS))
+    end = datetime.now()
+    try:
+        # 하루치 파일을 여러 개 읽으므로 이벤트 루프 밖에서 실행
+        buckets = await asyncio.get_running_loop().run_in_executor(
+            None, emotion_series.query, user.username, end - timedelta(days=days), end, resolution)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"resolution": resolution, "days": days, "buckets": buckets}
+
+@app.get("/emotion_weekly")
+async def emotion_weekly(user: AuthUser = Depends(get_current_user)):
+    """
+    최근 7일의 일별 감정 합계와 최다 감정 (시간 단위 롤업으로 계산)
+    """
+    return await asyncio.get_running_loop().run_in_executor(None, emotion_series.summary, user.username, 7)
+
 @app.get("/most_emotion_pic")
-async def most_emotion_pic(token: str = Header(...)):
-    user_id = await current_userId(token)  # 비동기 함수 호출로 user_id 추출
-    pic_path = get_most_emotion_pic_path(user_id)  # user_id로 사진 경로 가져오기
+async def most_emotion_pic(user: AuthUser = Depends(get_current_user)):
+    pic_path = get_most_emotion_pic_path(user.username)  # username으로 사진 경로 가져오기
     if not os.path.exists(pic_path):
         raise HTTPException(status_code=404, detail="Emotion picture not found.")
 
     return FileResponse(pic_path, media_type="image/jpeg")
 
 @app.get("/messages/{username}")
-async def get_messages(username: str):
-    user_id = fetch_user_id_by_username(username)
+async def get_messages(username: str, before: Optional[int] = None, after: Optional[int] = None,
+                       limit: int = DEFAULT_PAGE_SIZE):
+    """
+    채팅 메시지를 커서 기반으로 한 페이지씩 반환하는 엔드포인트
+    - 커서 없이 호출하면 가장 최근 페이지
+    - before=<id>: 해당 메시지보다 이전 페이지, after=<id>: 이후 페이지
+    - limit: 1..MAX_PAGE_SIZE 범위로 맞춤
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    user_id = await fetch_user_id_by_username(username)
     if user_id is None:
         raise HTTPException(status_code=404, detail="사용자를 찾을 수 없습니다.")
 
-    message_log = f"{user_id}_messages.json"
-
-    if not os.path.exists(message_log):
-        return {"messages": []}
-
-    with open(message_log, "r", encoding="utf-8") as file:
-        try:
-            messages = json.load(file)
-        except json.JSONDecodeError:
-            messages = []
-    return {"messages": messages}
+    group_key = family_group_key(await get_family(user_id) + [user_id])
+    messages, has_more = await asyncio.get_running_loop().run_in_executor(
+        None, lambda: message_store.page(group_key, user_id, before=before, after=after, limit=limit))
+    return {
+        "messages": messages,
+        "has_more": has_more,
+        "before": messages[0]["id"] if messages else before,
+        "after": messages[-1]["id"] if messages else after,
+    }
 
 @app.websocket("/ws/chat")
 async def websocket_endpoint(websocket: WebSocket):
@@ -155,20 +244,32 @@ async def websocket_endpoint(websocket: WebSocket):
 @app.post("/load_faces")
 async def load_faces():
     try:
-        load_faces_from_db()
+        await asyncio.get_running_loop().run_in_executor(None, load_faces_from_db)
         return {"message": "얼굴 이미지가 성공적으로 로드되었습니다."}
     except Exception as e:
         logger.error(f"얼굴 이미지 로드 중 오류 발생: {str(e)}")
         return {"error": "얼굴 이미지 로드 중 오류가 발생했습니다.", "details": str(e)}, 500
 
 
+@app.get("/upload_stats")
+async def get_upload_stats():
+    """
+    하이라이트 업로드 큐 상태 (대기/진행/완료/실패/재시도 수)를 반환하는 엔드포인트
+    """
+    return upload_queue.stats()
+
+
 @app.get("/s3_video_list")
-async def get_video_list():
+async def get_video_list(person: Optional[str] = None, emotion: Optional[str] = None,
+                         date: Optional[str] = None, cursor: Optional[str] = None,
+                         limit: int = DEFAULT_VIDEO_PAGE_SIZE):
     """
-    S3에 저장된 영상 목록을 반환하는 엔드포인트
+    S3에 저장된 영상 목록을 최신순으로 한 페이지씩 반환하는 엔드포인트
+    - person/emotion/date(YYYYMMDD)로 필터링
+    - cursor: 이전 응답의 next_cursor (없으면 첫 페이지)
     """
-    video_list = await list_s3_videos()
-    return {"videos": video_list}
+    video_list, next_cursor = list_s3_videos(person, emotion, date, cursor, limit)
+    return {"videos": video_list, "next_cursor": next_cursor}
 
 
 @app.get("/speech_text")
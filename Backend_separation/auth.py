@@ -0,0 +1,102 @@
+# auth.py
+# FastAPI 엔드포인트와 WebSocket이 함께 쓰는 JWT 인증
+#
+# Spring 백엔드가 발급한 HS256 토큰을 한 번 검증하면 (username, user_id, exp)를
+# LRU 캐시에 보관하고, 같은 토큰이 다시 오면 서명 검증과 DB 조회 없이 바로 돌려줍니다.
+# 캐시된 토큰도 exp가 지나면 만료로 처리합니다.
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+import jwt
+from dotenv import load_dotenv
+from fastapi import Header, HTTPException
+
+from family_cache import family_cache
+
+load_dotenv()
+
+SECRET_KEY = os.getenv("SECRET_KEY")
+
+if SECRET_KEY is None:
+    raise ValueError("No SECRET_KEY set for application")
+
+TOKEN_CACHE_SIZE = 1024
+
+
+class AuthUser(NamedTuple):
+    username: str
+    user_id: int
+    exp: Optional[float]  # 토큰 만료 시각 (epoch 초), 없으면 None
+
+
+class TokenCache:
+    def __init__(self, max_size=TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()  # token -> AuthUser
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token):
+        with self._lock:
+            user = self._entries.get(token)
+            if user is None:
+                self.misses += 1
+                return None
+            if user.exp is not None and user.exp <= time.time():
+                del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return user
+
+    def put(self, token, user):
+        with self._lock:
+            self._entries[token] = user
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+token_cache = TokenCache()
+
+
+async def authenticate(token: str) -> AuthUser:
+    """토큰을 검증하고 사용자 정보를 반환합니다. 실패하면 HTTPException(401/404)."""
+    user = token_cache.get(token)
+    if user is not None:
+        return user
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])  # exp가 있으면 함께 검증
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Token has expired")
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    username = payload.get("username")
+    if not username:
+        raise HTTPException(status_code=401, detail="Username not found in token")
+
+    user_id = await family_cache.auser_id(username)
+    if user_id is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    exp = payload.get("exp")
+    user = AuthUser(username, user_id, float(exp) if exp is not None else None)
+    token_cache.put(token, user)
+    return user
+
+
+async def get_current_user(token: str = Header(...)) -> AuthUser:
+    """`token` 헤더로 인증하는 FastAPI 의존성"""
+    return await authenticate(token)
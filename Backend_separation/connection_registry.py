@@ -0,0 +1,102 @@
+# connection_registry.py
+# 사용자별로 WebSocket 연결을 관리하고 가족에게 메시지를 동시에 전달하는 레지스트리
+#
+# 가족 구성원은 연결 시점에 고정하지 않고, 메시지마다 family_cache에서 받은 목록으로 전달합니다.
+# 그래서 POST /family/invalidate 로 가족이 바뀌면 열려 있는 연결에도 바로 반영됩니다.
+
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+SEND_QUEUE_SIZE = 64  # 소켓별로 밀려 있을 수 있는 최대 메시지 수
+SEND_TIMEOUT = 5.0  # 한 메시지 전송이 이보다 오래 걸리면 느린 클라이언트로 보고 끊음
+
+
+class ClientConnection:
+    """
+    소켓 하나와 전송 큐. 전용 태스크가 큐에서 꺼내 순서대로 보내므로
+    느린 소켓이 다른 가족의 수신을 막지 않습니다.
+    """
+
+    def __init__(self, websocket, user_id, registry):
+        self.websocket = websocket
+        self.user_id = user_id
+        self._registry = registry
+        self._queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self._task = asyncio.create_task(self._send_loop())
+
+    def offer(self, text):
+        """큐에 넣기만 하고 바로 반환합니다. 큐가 가득 찼으면 False."""
+        try:
+            self._queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def _send_loop(self):
+        try:
+            while True:
+                text = await self._queue.get()
+                await asyncio.wait_for(self.websocket.send_text(text), SEND_TIMEOUT)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.info(f">> 메시지 전송 실패 to {self.user_id}, 연결 제거: {e}")
+            self._registry.evict(self)
+
+    def close(self):
+        if not self._task.done():
+            self._task.cancel()
+
+
+class ConnectionRegistry:
+    def __init__(self):
+        self.by_user = {}  # user_id -> {ClientConnection}
+        self.evicted = 0
+
+    def register(self, websocket, user_id):
+        """인증된 소켓을 등록합니다. 한 사용자가 여러 기기로 접속할 수 있습니다."""
+        connection = ClientConnection(websocket, user_id, self)
+        self.by_user.setdefault(user_id, set()).add(connection)
+        return connection
+
+    def unregister(self, connection):
+        connection.close()
+        connections = self.by_user.get(connection.user_id)
+        if connections is None or connection not in connections:
+            return
+        connections.discard(connection)
+        if not connections:
+            del self.by_user[connection.user_id]
+
+    def evict(self, connection):
+        """큐가 넘치거나 전송이 실패한 느린 클라이언트를 끊습니다."""
+        self.evicted += 1
+        self.unregister(connection)
+        asyncio.create_task(self._close_quietly(connection.websocket))
+
+    @staticmethod
+    async def _close_quietly(websocket):
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+    def broadcast(self, recipients, text):
+        """recipients(보낸 사람과 현재 가족 구성원)가 접속한 모든 소켓의 큐에 메시지를 넣습니다. (대기 없음)"""
+        delivered = 0
+        slow = []
+        for user_id in set(recipients):
+            for connection in self.by_user.get(user_id, ()):
+                if connection.offer(text):
+                    delivered += 1
+                else:
+                    slow.append(connection)
+        for connection in slow:
+            logger.info(f">> 전송 큐가 가득 찬 클라이언트 제거: {connection.user_id}")
+            self.evict(connection)
+        return delivered
+
+
+connection_registry = ConnectionRegistry()
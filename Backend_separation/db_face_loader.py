@@ -1,90 +1,118 @@
 import os
-import shutil
-import mysql.connector
-from mysql.connector import Error
-from dotenv import load_dotenv
+import json
+import pymysql
 import base64
 import logging
+import threading
+from face_index import face_index
+from db_pool import db_pool
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# .env 파일에서 환경 변수 로드
-load_dotenv()
+FACES_DIR = os.path.join(os.path.dirname(__file__), 'faces')
+MANIFEST_PATH = os.path.join(FACES_DIR, 'manifest.json')  # nickname -> 사진 해시
+INDEX_PATH = os.path.join(FACES_DIR, 'embeddings.npz')
+# 시작 시 동기화와 POST /load_faces가 겹치면 manifest/사진/인덱스를 동시에 고치므로 한 번에 하나씩 실행
+sync_lock = threading.Lock()
 
-# 데이터베이스 연결 정보
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST'),
-    'user': os.getenv('DB_USER'),
-    'password': os.getenv('DB_PASSWORD'),
-    'database': os.getenv('DB_NAME')
-}
 
-def clear_faces_directory(faces_dir):
-    if os.path.exists(faces_dir):
-        shutil.rmtree(faces_dir)
-    os.makedirs(faces_dir)
-    logger.info(f"faces 디렉토리를 비우고 새로 생성했습니다: {faces_dir}")
+def load_manifest():
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    try:
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (json.JSONDecodeError, OSError) as e:
+        logger.warning(f"manifest 파일을 읽을 수 없어 전체를 다시 동기화합니다: {e}")
+        return {}
+
+
+def save_manifest(manifest):
+    tmp_path = f"{MANIFEST_PATH}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def decode_photo(photoname):
+    # Base64 문자열에서 'data:image/jpeg;base64,' 부분 제거
+    if isinstance(photoname, str) and photoname.startswith('data:image/jpeg;base64,'):
+        photoname = photoname.split(',', 1)[1]
+
+    # 패딩 추가 (필요한 경우)
+    if isinstance(photoname, str):
+        photoname += '=' * ((4 - len(photoname) % 4) % 4)
+        return base64.b64decode(photoname)
+    return photoname  # 이미 바이너리 데이터인 경우
+
 
 def load_faces_from_db():
+    """
+    userentity의 사진 해시와 manifest를 비교해서 바뀐 사용자만 다시 받아옵니다.
+    추가/변경된 사진은 파일과 임베딩을 교체하고, 사라진 사용자는 둘 다 삭제합니다.
+    이미 동기화 중이면 끝날 때까지 기다렸다가 그 뒤의 DB 상태로 다시 동기화합니다.
+    """
+    with sync_lock:
+        _sync_faces()
+
+
+def _sync_faces():
+    os.makedirs(FACES_DIR, exist_ok=True)
+    manifest = load_manifest()
+
+    # 인덱스 파일이 manifest와 맞지 않으면 manifest를 믿을 수 없으므로 처음부터 동기화
+    if not face_index.load(INDEX_PATH) or set(face_index.names) != set(manifest):
+        face_index.clear()
+        manifest = {}
+
     try:
-        # faces 디렉토리 생성 및 초기화
-        faces_dir = os.path.join(os.path.dirname(__file__), 'faces')
-        clear_faces_directory(faces_dir)
-        
-        # 데이터베이스 연결
-        connection = mysql.connector.connect(**DB_CONFIG)
-        
-        if connection.is_connected():
-            cursor = connection.cursor()
-            
-            # 사용자 정보 조회
-            query = "SELECT nickname, photoname FROM userentity"
-            cursor.execute(query)
-            records = cursor.fetchall()
-            
-            for record in records:
-                nickname, photoname = record
-                if photoname:
-                    try:
-                        # 이미지 데이터 형식 확인
-                        logger.info(f"사용자 {nickname}의 이미지 데이터 형식: {type(photoname)}")
-                        logger.info(f"이미지 데이터 시작 부분: {photoname[:50]}")  # 처음 50자만 출력
-                        
-                        # Base64 문자열에서 'data:image/jpeg;base64,' 부분 제거
-                        if isinstance(photoname, str) and photoname.startswith('data:image/jpeg;base64,'):
-                            photoname = photoname.split(',', 1)[1]
-                        
-                        # 패딩 추가 (필요한 경우)
-                        if isinstance(photoname, str):
-                            photoname += '=' * ((4 - len(photoname) % 4) % 4)
-                        
-                        # BLOB 데이터를 이미지 파일로 저장
-                        if isinstance(photoname, str):
-                            image_data = base64.b64decode(photoname)
-                        else:
-                            image_data = photoname  # 이미 바이너리 데이터인 경우
-                        
-                        file_path = os.path.join(faces_dir, f"{nickname}.jpg")
-                        with open(file_path, 'wb') as file:
-                            file.write(image_data)
-                        logger.info(f"저장된 이미지: {file_path}")
-                    except Exception as e:
-                        logger.error(f"사용자 {nickname}의 사진 처리 중 오류 발생: {e}")
-                else:
-                    logger.warning(f"사용자 {nickname}의 사진이 없습니다.")
-            
-            logger.info("모든 얼굴 이미지가 성공적으로 로드되었습니다.")
-    
-    except Error as e:
+        # 사진 본문 대신 해시만 조회해서 변경 여부 판단
+        rows = db_pool.fetchall("SELECT nickname, MD5(photoname) FROM userentity", name="face_photo_hashes")
+        current = {}
+        for nickname, photo_hash in rows:
+            if photo_hash:
+                current[nickname] = photo_hash
+            else:
+                logger.warning(f"사용자 {nickname}의 사진이 없습니다.")
+
+        changed = [nickname for nickname, photo_hash in current.items() if manifest.get(nickname) != photo_hash]
+        removed = [nickname for nickname in manifest if nickname not in current]
+
+        for nickname in removed:
+            file_path = os.path.join(FACES_DIR, f"{nickname}.jpg")
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            face_index.remove(nickname)
+            manifest.pop(nickname, None)
+            logger.info(f"삭제된 사용자 사진 제거: {nickname}")
+
+        if changed:
+            placeholders = ', '.join(['%s'] * len(changed))
+            rows = db_pool.fetchall(
+                f"SELECT nickname, photoname, MD5(photoname) FROM userentity WHERE nickname IN ({placeholders})",
+                changed,
+                name="face_photos"
+            )
+            for nickname, photoname, photo_hash in rows:
+                try:
+                    file_path = os.path.join(FACES_DIR, f"{nickname}.jpg")
+                    with open(file_path, 'wb') as file:
+                        file.write(decode_photo(photoname))
+                    face_index.upsert(nickname, file_path)
+                    manifest[nickname] = photo_hash
+                    logger.info(f"저장된 이미지: {file_path}")
+                except Exception as e:
+                    logger.error(f"사용자 {nickname}의 사진 처리 중 오류 발생: {e}")
+
+        if changed or removed:
+            face_index.save(INDEX_PATH)
+            save_manifest(manifest)
+        logger.info(f"얼굴 이미지 동기화 완료: 변경 {len(changed)}명, 삭제 {len(removed)}명, 전체 {len(face_index)}명")
+
+    except (pymysql.MySQLError, TimeoutError) as e:
         logger.error(f"데이터베이스 오류: {e}")
-    
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
-            logger.info("데이터베이스 연결이 종료되었습니다.")
 
 if __name__ == "__main__":
-    load_faces_from_db()
\ No newline at end of file
+    load_faces_from_db()
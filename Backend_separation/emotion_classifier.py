@@ -0,0 +1,74 @@
+# emotion_classifier.py
+# 한 프레임의 얼굴들을 묶어서 한 번의 forward pass로 감정을 분류하는 배치 분류기
+
+import logging
+import threading
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# DeepFace 감정 모델과 동일한 클래스 순서 (FER2013)
+EMOTION_LABELS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+INPUT_SIZE = 48  # 48x48 흑백 입력 (unused/train.py의 CNN과 같은 형태)
+
+
+class BatchEmotionClassifier:
+    """
+    얼굴 crop 목록을 (N, 48, 48, 1) 배치로 쌓아 한 번에 분류합니다.
+    model_path를 지정하면 해당 Keras 모델을, 없으면 DeepFace의 감정 모델을 사용합니다.
+    """
+
+    def __init__(self, model_path=None):
+        self._model_path = model_path
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._model is not None:
+                return self._model
+            if self._model_path:
+                import tensorflow as tf
+                self._model = tf.keras.models.load_model(self._model_path, compile=False)
+            else:
+                from deepface import DeepFace
+                try:
+                    client = DeepFace.build_model(model_name="Emotion", task="facial_attribute")
+                except TypeError:
+                    client = DeepFace.build_model("Emotion")  # 이전 버전 DeepFace
+                # 최신 DeepFace는 Keras 모델을 .model 속성으로 감싸서 반환
+                self._model = getattr(client, "model", client)
+            logger.info("감정 분류 모델 로드 완료")
+            return self._model
+
+    @staticmethod
+    def preprocess(face_images):
+        """BGR 얼굴 crop 목록 -> (N, 48, 48, 1) float32 배치"""
+        batch = np.empty((len(face_images), INPUT_SIZE, INPUT_SIZE, 1), dtype=np.float32)
+        for i, face_image in enumerate(face_images):
+            gray = cv2.cvtColor(face_image, cv2.COLOR_BGR2GRAY) if face_image.ndim == 3 else face_image
+            batch[i, :, :, 0] = cv2.resize(gray, (INPUT_SIZE, INPUT_SIZE), interpolation=cv2.INTER_AREA)
+        batch /= 255.0
+        return batch
+
+    def classify(self, face_images):
+        """
+        반환값: 얼굴마다 (dominant_emotion, {감정: 확률(%)}) 튜플의 리스트.
+        DeepFace.analyze 결과와 같은 키/단위를 사용합니다.
+        """
+        if not face_images:
+            return []
+        model = self._load()
+        batch = self.preprocess(face_images)
+        predictions = np.asarray(model(batch, training=False))  # 얼굴 수와 무관하게 forward 1회
+
+        results = []
+        for prediction in predictions:
+            scores = {label: float(score) * 100 for label, score in zip(EMOTION_LABELS, prediction)}
+            results.append((EMOTION_LABELS[int(np.argmax(prediction))], scores))
+        return results
+
+
+emotion_classifier = BatchEmotionClassifier()
@@ -1,9 +1,16 @@
 import os
 import json
+import atexit
+import threading
+import time
 from datetime import datetime
 import cv2
 from dateutil.utils import today
-from emotion_video import delete_old_videos
+from emotion_video import delete_old_videos, HIGHLIGHT_DIR
+from emotion_timeseries import EmotionTimeSeries
+
+EMOTIONS = ['Angry', 'Disgust', 'Fear', 'Happy', 'Sad', 'Surprise', 'Neutral']
+FLUSH_INTERVAL = 30.0  # 메모리의 감정 집계를 파일로 기록하는 주기 (초)
 
 def get_emotion_file_today(person_name):
     base_dir = os.path.abspath("../Backend_separation/emotions")
@@ -11,40 +18,149 @@ def get_emotion_file_today(person_name):
         os.makedirs(base_dir)
     return os.path.join(base_dir, f"emotion_today_{person_name}.json")
 
-def save_emotion_result(person_name, emotion):
-    if emotion == 'Neutral':
-        return
-
+class EmotionAggregate:
+    """
+    한 사람의 하루 감정 집계. 일(daily)/시간(hourly) 버킷과 최다 감정(Neutral 제외)을 함께 유지합니다.
+    카운트는 증가만 하므로 최다 감정은 방금 증가한 감정과 기존 최다 감정만 비교하면 됩니다.
+    """
+
+    def __init__(self, day, daily=None, hourly=None):
+        self.day = day  # 'YYYY-MM-DD'
+        self.daily = initialize_emotion_data()
+        self.daily.update(daily or {})
+        self.hourly = {hour: {**initialize_emotion_data(), **counts} for hour, counts in (hourly or {}).items()}
+        self.most_frequent = None
+        for emotion, count in self.daily.items():
+            if emotion != 'Neutral' and count > 0 and (
+                    self.most_frequent is None or count > self.daily[self.most_frequent]):
+                self.most_frequent = emotion
+
+    def add(self, emotion, hour):
+        self.daily[emotion] += 1
+        if hour not in self.hourly:
+            self.hourly[hour] = initialize_emotion_data()
+        self.hourly[hour][emotion] += 1
+        if emotion != 'Neutral' and (
+                self.most_frequent is None or self.daily[emotion] > self.daily[self.most_frequent]):
+            self.most_frequent = emotion
+
+    def to_dict(self):
+        return {"date": self.day, "daily": self.daily, "hourly": self.hourly, "most_frequent": self.most_frequent}
+
+
+class EmotionAggregator:
+    """
+    사람별 감정 집계를 메모리에서 갱신하고, FLUSH_INTERVAL마다 바뀐 것만
+    emotion_today_{name}.json 에 기록합니다. 감지 한 번에 파일을 읽고 쓰지 않습니다.
+    """
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._people = {}  # person_name -> EmotionAggregate
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def _load(self, person_name, day):
+        """메모리에 없으면 파일에서 한 번만 읽어옵니다. 날짜가 지난 집계는 새로 시작합니다."""
+        aggregate = self._people.get(person_name)
+        if aggregate is not None and aggregate.day == day:
+            return aggregate
+
+        if aggregate is None:
+            aggregate = read_emotion_file(person_name)
+        if aggregate is None or aggregate.day != day:
+            aggregate = EmotionAggregate(day)
+        self._people[person_name] = aggregate
+        return aggregate
+
+    def record(self, person_name, emotion):
+        now = datetime.now()
+        with self._lock:
+            aggregate = self._load(person_name, now.strftime('%Y-%m-%d'))
+            aggregate.add(emotion, now.strftime('%H'))
+            self._dirty.add(person_name)
+            most_frequent = aggregate.most_frequent
+        emotion_series.record(person_name, emotion, now)
+        self._ensure_flusher()
+        return most_frequent
+
+    def most_frequent(self, person_name):
+        with self._lock:
+            return self._load(person_name, datetime.now().strftime('%Y-%m-%d')).most_frequent
+
+    def reset(self, person_name):
+        with self._lock:
+            self._people[person_name] = EmotionAggregate(datetime.now().strftime('%Y-%m-%d'))
+            self._dirty.add(person_name)
+        self.flush()
+
+    def summary(self, person_name):
+        """오늘의 일/시간 버킷과 최다 감정"""
+        with self._lock:
+            return self._load(person_name, datetime.now().strftime('%Y-%m-%d')).to_dict()
+
+    def _ensure_flusher(self):
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name="emotion-flush", daemon=True)
+            self._flusher.start()
+            atexit.register(self.flush)
+
+    def _flush_loop(self):
+        last_day = datetime.now().date()
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+                if datetime.now().date() != last_day:
+                    last_day = datetime.now().date()
+                    manage_daily_files()
+            except Exception as e:
+                print(f"Error while flushing emotion data: {e}")
+
+    def flush(self):
+        emotion_series.flush()
+        with self._lock:
+            snapshots = {name: json.dumps(self._people[name].to_dict(), indent=4) for name in self._dirty}
+            self._dirty.clear()
+        for person_name, data in snapshots.items():
+            file_path = get_emotion_file_today(person_name)
+            tmp_path = f"{file_path}.tmp"
+            with open(tmp_path, 'w') as file:
+                file.write(data)
+            os.replace(tmp_path, file_path)
+        if snapshots:
+            print(f"Emotion data flushed: {', '.join(snapshots)}")
+
+
+def read_emotion_file(person_name):
     file_path = get_emotion_file_today(person_name)
-    if os.path.exists(file_path):
+    try:
         with open(file_path, 'r') as file:
-            emotion_data = json.load(file)
-    else:
-        emotion_data = initialize_emotion_data()
-
-    # 감정 데이터의 키를 소문자로 맞춘 후, 해당 감정 값을 증가
-    emotion = emotion.capitalize()
-    if emotion in emotion_data:
-        emotion_data[emotion] += 1
+            data = json.load(file)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if "daily" in data:
+        return EmotionAggregate(data.get("date"), data["daily"], data.get("hourly"))
+    # 예전 형식: 감정별 누적 카운트만 있는 파일. 수정 날짜를 집계 날짜로 사용
+    day = datetime.fromtimestamp(os.path.getmtime(file_path)).strftime('%Y-%m-%d')
+    return EmotionAggregate(day, data)
 
-    with open(file_path, 'w') as file:
-        json.dump(emotion_data, file, indent=4)
-    print(f"Emotion data saved to {file_path}")
 
-def get_most_frequent_emotion(person_name):
-    try:
-        emotion_file_path = get_emotion_file_today(person_name)
-        with open(emotion_file_path, 'r') as f:
-            emotion_data = json.load(f)
+emotion_series = EmotionTimeSeries(os.path.abspath("../Backend_separation/emotions/series"), EMOTIONS)
+emotion_aggregator = EmotionAggregator()
 
-        # 'Neutral'을 제외하고 최다 감정을 찾음
-        non_neutral_emotions = {k: v for k, v in emotion_data.items() if k != 'Neutral'}
-        most_frequent_emotion = max(non_neutral_emotions, key=non_neutral_emotions.get)
 
-        return most_frequent_emotion
-    except Exception as e:
-        print(f"Error while retrieving most frequent emotion: {e}")
+def save_emotion_result(person_name, emotion):
+    # 감정 데이터의 키를 대문자로 시작하도록 맞춘 후, 해당 감정 값을 증가
+    emotion = emotion.capitalize()
+    if emotion == 'Neutral' or emotion not in EMOTIONS:
         return None
+    return emotion_aggregator.record(person_name, emotion)
+
+def get_most_frequent_emotion(person_name):
+    # 'Neutral'을 제외한 최다 감정 (집계가 없으면 None)
+    return emotion_aggregator.most_frequent(person_name)
 
 def save_most_emotion_pic(frame, current_emotion, person_name):
     # 최다 감정 사진 경로 설정
@@ -74,24 +190,17 @@ def get_most_emotion_pic_path(person_name):
     return os.path.join(base_dir, f"most_emotion_pic_{person_name}.jpg")
 
 def initialize_emotion_data():
-    return {emotion: 0 for emotion in ['Angry', 'Disgust', 'Fear', 'Happy', 'Sad', 'Surprise', 'Neutral']}
+    return {emotion: 0 for emotion in EMOTIONS}
 
-def reset_emotion_file():
-    file_path = get_emotion_file_today()
-    with open(file_path, 'w') as file:
-        json.dump(initialize_emotion_data(), file)
-    print(f"{file_path} has been reset.")
+def reset_emotion_file(person_name):
+    emotion_aggregator.reset(person_name)
+    print(f"{get_emotion_file_today(person_name)} has been reset.")
 
 def manage_daily_files():
-    today = datetime.today().strftime('%Y-%m-%d') # 오늘 날짜
-    file_path = get_emotion_file_today()
-
-    # 파일의 최종 수정 날짜를 확인하여 하루가 지났는지 확인
-    if os.path.exists(file_path):
-        last_modified_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-        if last_modified_time.strftime('%Y-%m-%d') != today:
-            # 감정 데이터 초기화
-            reset_emotion_file()
+    # 오늘 감정 집계는 날짜가 바뀌면 EmotionAggregator가 새로 시작하므로 파일을 따로 초기화하지 않음
+    # 보관 기간이 지난 분 단위 감정 원본 삭제 (시간 롤업은 주간 요약용으로 유지)
+    emotion_series.prune()
 
     # 이전 하이라이트 영상 삭제
-    delete_old_videos(os.path.dirname(file_path), days=2)
\ No newline at end of file
+    if os.path.isdir(HIGHLIGHT_DIR):
+        delete_old_videos(HIGHLIGHT_DIR, days=2)
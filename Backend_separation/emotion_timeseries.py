@@ -0,0 +1,177 @@
+# emotion_timeseries.py
+# 사람별 감정 감지 횟수를 분 단위로 저장하는 시계열 저장소
+#
+# 하루치 데이터는 두 파일로 저장합니다.
+#   {person}/{YYYYMMDD}.min  : (1440, 감정 수) uint8, 분당 감정별 횟수 (255에서 포화)
+#   {person}/{YYYYMMDD}.hour : (24, 감정 수) uint32, 시간 단위 롤업
+# 시간/일 단위 조회와 주간 요약은 작은 .hour 파일만 읽습니다.
+
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+MINUTES_PER_DAY = 24 * 60
+RESOLUTIONS = ('minute', 'hour', 'day')
+MAX_MINUTE_RANGE = timedelta(days=1)  # 분 단위 조회는 하루까지만 허용
+RAW_RETENTION_DAYS = 30  # 분 단위 원본 보관 기간 (시간 롤업은 계속 보관)
+
+
+class EmotionTimeSeries:
+    def __init__(self, base_dir, labels):
+        self.base_dir = base_dir
+        self.labels = list(labels)
+        self._label_index = {label: i for i, label in enumerate(self.labels)}
+        self._days = {}  # (person, date) -> (분 배열, 시간 배열). 오늘과 아직 기록하지 않은 날만 메모리에 둠
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    # ---------------------------------------------------------------- 파일
+    def _path(self, person, day, kind):
+        return os.path.join(self.base_dir, person, f"{day:%Y%m%d}.{kind}")
+
+    def _read(self, person, day, kind, dtype, rows):
+        path = self._path(person, day, kind)
+        if not os.path.exists(path):
+            return None
+        data = np.fromfile(path, dtype=dtype)
+        if data.size != rows * len(self.labels):
+            return None  # 감정 종류가 바뀌었거나 쓰다 만 파일
+        return data.reshape(rows, len(self.labels))
+
+    def _write(self, person, day, kind, array):
+        path = self._path(person, day, kind)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        array.tofile(tmp_path)
+        os.replace(tmp_path, path)
+
+    def _day(self, person, day, create=False, minutes=True):
+        """
+        하루치 (분 배열, 시간 배열). create면 메모리에 올려두고 기록에 사용합니다.
+        조회만 할 때 minutes=False면 시간 롤업 파일만 읽습니다. (분 배열은 None)
+        """
+        key = (person, day)
+        arrays = self._days.get(key)
+        if arrays is not None:
+            return arrays
+
+        hourly = self._read(person, day, 'hour', np.uint32, 24)
+        if not create and not minutes:
+            return (None, hourly) if hourly is not None else None
+
+        minute_counts = self._read(person, day, 'min', np.uint8, MINUTES_PER_DAY)
+        if minute_counts is None and hourly is None and not create:
+            return None
+        if minute_counts is None:
+            minute_counts = np.zeros((MINUTES_PER_DAY, len(self.labels)), dtype=np.uint8)
+        if hourly is None:
+            hourly = minute_counts.reshape(24, 60, -1).sum(axis=1, dtype=np.uint32)
+        arrays = (minute_counts, hourly)
+        if create:
+            self._days[key] = arrays
+        return arrays
+
+    # ---------------------------------------------------------------- 쓰기
+    def record(self, person, label, when=None):
+        index = self._label_index.get(label)
+        if index is None:
+            return
+        when = when or datetime.now()
+        with self._lock:
+            minutes, hourly = self._day(person, when.date(), create=True)
+            minute = when.hour * 60 + when.minute
+            if minutes[minute, index] < 255:
+                minutes[minute, index] += 1
+            hourly[when.hour, index] += 1
+            self._dirty.add((person, when.date()))
+
+    def flush(self):
+        """바뀐 날짜의 파일을 기록하고, 지난 날짜는 메모리에서 내립니다."""
+        today = datetime.now().date()
+        with self._lock:
+            snapshots = [(person, day, *(array.copy() for array in self._days[(person, day)]))
+                         for person, day in self._dirty]
+            self._dirty.clear()
+            for key in [key for key in self._days if key[1] != today]:
+                del self._days[key]
+        for person, day, minutes, hourly in snapshots:
+            self._write(person, day, 'min', minutes)
+            self._write(person, day, 'hour', hourly)
+
+    def prune(self, retention_days=RAW_RETENTION_DAYS):
+        """보관 기간이 지난 분 단위 원본을 삭제합니다. 시간 롤업은 남겨둡니다."""
+        if not os.path.isdir(self.base_dir):
+            return
+        cutoff = f"{datetime.now().date() - timedelta(days=retention_days):%Y%m%d}"
+        for person in os.listdir(self.base_dir):
+            person_dir = os.path.join(self.base_dir, person)
+            for name in os.listdir(person_dir):
+                if name.endswith('.min') and name[:8] < cutoff:
+                    os.remove(os.path.join(person_dir, name))
+
+    # ---------------------------------------------------------------- 조회
+    def _counts(self, row):
+        return {label: int(count) for label, count in zip(self.labels, row)}
+
+    def query(self, person, start, end, resolution='hour'):
+        """
+        [start, end) 구간을 resolution(minute/hour/day) 단위로 집계합니다.
+        감지가 없는 구간은 생략하고 [{"start": ISO 시각, "counts": {감정: 횟수}}] 를 반환합니다.
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution must be one of {RESOLUTIONS}")
+        if resolution == 'minute' and end - start > MAX_MINUTE_RANGE:
+            raise ValueError("minute resolution is limited to one day")
+
+        buckets = []
+        day = start.date()
+        while day <= end.date() and datetime.combine(day, datetime.min.time()) < end:
+            with self._lock:
+                arrays = self._day(person, day, minutes=resolution == 'minute')
+                if arrays is not None:
+                    arrays = (arrays[0].copy() if resolution == 'minute' else None, arrays[1].copy())
+            if arrays is not None:
+                minutes, hourly = arrays
+                day_start = datetime.combine(day, datetime.min.time())
+                if resolution == 'day':
+                    rows, step = hourly.sum(axis=0, keepdims=True), timedelta(days=1)
+                elif resolution == 'hour':
+                    rows, step = hourly, timedelta(hours=1)
+                else:
+                    rows, step = minutes, timedelta(minutes=1)
+                for i, row in enumerate(rows):
+                    bucket_start = day_start + step * i
+                    if not row.any() or bucket_start + step <= start or bucket_start >= end:
+                        continue
+                    buckets.append({"start": bucket_start.isoformat(), "counts": self._counts(row)})
+            day += timedelta(days=1)
+        return buckets
+
+    def summary(self, person, days=7, exclude=('Neutral',)):
+        """최근 days일의 일별 합계와 최다 감정. 시간 롤업만 읽습니다."""
+        today = datetime.now().date()
+        total = np.zeros(len(self.labels), dtype=np.uint64)
+        daily = []
+        for offset in range(days - 1, -1, -1):
+            day = today - timedelta(days=offset)
+            with self._lock:
+                arrays = self._day(person, day, minutes=False)
+                counts = arrays[1].sum(axis=0, dtype=np.uint64) if arrays is not None else None
+            if counts is None:
+                continue
+            total += counts
+            daily.append({"date": day.isoformat(), "counts": self._counts(counts),
+                          "dominant": self._dominant(counts, exclude)})
+        return {
+            "days": days,
+            "daily": daily,
+            "total": self._counts(total),
+            "dominant": self._dominant(total, exclude),
+        }
+
+    def _dominant(self, counts, exclude):
+        candidates = [(int(count), label) for label, count in zip(self.labels, counts) if label not in exclude]
+        best_count, best_label = max(candidates, key=lambda item: item[0], default=(0, None))
+        return best_label if best_count > 0 else None
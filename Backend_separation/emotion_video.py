@@ -41,7 +41,7 @@ def delete_old_videos(directory, days=2):
     for filename in os.listdir(directory):
         if filename.endswith(".avi"):
             try:
-                date_part = filename.split('_')[-1].replace('.avi', '')
+                date_part = filename.split('_')[0]  # {날짜}_{이름}_{번호}.avi
                 video_date = datetime.datetime.strptime(date_part, '%Y-%m-%d')
                 if (now - video_date).days >= days:
                     os.remove(os.path.join(directory, filename))
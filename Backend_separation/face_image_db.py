@@ -1,36 +1,14 @@
-import pymysql
 import os
 import logging
 from dotenv import load_dotenv
+from db_pool import db_pool
 
 # .env 파일에서 환경 변수 로드
 load_dotenv()
 
-# 환경 변수에서 데이터베이스 연결 정보 가져오기
-db_host = os.getenv('DB_HOST')
-db_user = os.getenv('DB_USER')
-db_password = os.getenv('DB_PASSWORD')
-db_name = os.getenv('DB_NAME')
-SECRET_KEY = os.getenv('SECRET_KEY')
-
-def get_db_connection():
-    return pymysql.connect(
-        host=db_host,
-        user=db_user,
-        password=db_password,
-        database=db_name
-    )
-
 def fetch_user_id_by_username(username):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
     query = "SELECT id FROM userentity WHERE username = %s"
-    cursor.execute(query, (username,))
-    result = cursor.fetchone()
-
-    cursor.close()
-    conn.close()
+    result = db_pool.fetchone(query, (username,), name="user_id_by_username")
 
     if result:
         return result[0]
@@ -42,9 +20,6 @@ def fetch_family_photos(username):
         logging.error(f"User with username {username} not found.")
         return
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
     query = """
         SELECT user1.photoname, user1.nickname, user2.photoname, user2.nickname 
         FROM familyship 
@@ -52,10 +27,7 @@ def fetch_family_photos(username):
         JOIN userentity user2 ON familyship.user2_id = user2.id
         WHERE (user1.id = %s OR user2.id = %s) AND user1.photoname IS NOT NULL AND user2.photoname IS NOT NULL
     """
-    cursor.execute(query, (user_id, user_id))
-    results = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    results = db_pool.fetchall(query, (user_id, user_id), name="family_photos")
 
     # 'faces' 디렉토리에 사진 저장
     faces_dir = 'faces'
@@ -81,15 +53,3 @@ def fetch_family_photos(username):
 
     logging.info(f"가족 nicknames: {', '.join(family_nicknames)}")
 
-
-async def current_userId(token: str):
-    try:
-        from jose import jwt
-        payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-        user_id = payload.get('username')
-
-        if not user_id:
-            raise ValueError("User ID not found in token")
-        return user_id
-    except jwt.JWTError as e:
-        raise ValueError(f"Invalid token: {str(e)}")
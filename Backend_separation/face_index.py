@@ -0,0 +1,117 @@
+# face_index.py
+# 등록된 얼굴 사진의 임베딩을 미리 계산해 두고 벡터 연산으로 검색하는 인덱스
+
+import logging
+import os
+import threading
+
+import numpy as np
+from deepface import DeepFace
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = 'VGG-Face'
+DISTANCE_THRESHOLD = 0.4  # 코사인 거리 기준 (DeepFace.find 사용 시와 동일)
+
+
+def represent(image):
+    """
+    얼굴 이미지(파일 경로 또는 BGR 배열)를 L2 정규화된 임베딩 벡터로 변환합니다.
+    """
+    result = DeepFace.represent(image, model_name=MODEL_NAME, enforce_detection=False)
+    embedding = np.asarray(result[0]['embedding'], dtype=np.float32)
+    norm = np.linalg.norm(embedding)
+    return embedding / norm if norm > 0 else embedding
+
+
+class FaceEmbeddingIndex:
+    """
+    등록된 얼굴 임베딩을 (N, D) 크기의 연속된 행렬 하나로 보관합니다.
+    검색은 쿼리 얼굴 1회 추론 + 행렬 곱 1회로 끝나므로 등록 사진 수와 무관하게 일정합니다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (이름 목록, 임베딩 행렬)을 튜플 하나로 교체해서 검색 쪽은 락 없이 일관된 스냅샷을 읽음
+        self._state = ([], np.empty((0, 0), dtype=np.float32))
+
+    def __len__(self):
+        return len(self._state[0])
+
+    @property
+    def names(self):
+        return list(self._state[0])
+
+    def clear(self):
+        with self._lock:
+            self._state = ([], np.empty((0, 0), dtype=np.float32))
+
+    def upsert(self, name, image_path):
+        """한 사람의 사진만 다시 임베딩해서 추가하거나 교체합니다."""
+        vector = represent(image_path)
+        with self._lock:
+            names, matrix = self._state
+            rows = [matrix[i] for i, n in enumerate(names) if n != name]
+            kept = [n for n in names if n != name]
+            rows.append(vector)
+            kept.append(name)
+            self._state = (kept, np.ascontiguousarray(np.vstack(rows), dtype=np.float32))
+
+    def remove(self, name):
+        """등록 해제된 사람의 임베딩을 제거합니다."""
+        with self._lock:
+            names, matrix = self._state
+            keep = [i for i, n in enumerate(names) if n != name]
+            if len(keep) == len(names):
+                return
+            kept_names = [names[i] for i in keep]
+            if keep:
+                kept_matrix = np.ascontiguousarray(matrix[keep])
+            else:
+                kept_matrix = np.empty((0, 0), dtype=np.float32)
+            self._state = (kept_names, kept_matrix)
+
+    def save(self, path):
+        """재시작 시 다시 계산하지 않도록 인덱스를 파일로 저장합니다."""
+        names, matrix = self._state
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as file:
+            np.savez(file, names=np.array(names, dtype=str), embeddings=matrix)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        """저장된 인덱스를 읽어옵니다. 파일이 없거나 손상된 경우 False를 반환합니다."""
+        if not os.path.exists(path):
+            return False
+        try:
+            with np.load(path) as data:
+                names = [str(n) for n in data['names']]
+                matrix = np.ascontiguousarray(data['embeddings'], dtype=np.float32)
+        except Exception as e:
+            logger.error(f"얼굴 임베딩 인덱스 로드 중 오류 발생: {e}")
+            return False
+        with self._lock:
+            self._state = (names, matrix)
+        logger.info(f"저장된 얼굴 임베딩 인덱스 로드: {len(names)}명")
+        return True
+
+    def search(self, face_image, threshold=DISTANCE_THRESHOLD):
+        """
+        얼굴 이미지와 가장 가까운 등록 얼굴을 찾습니다.
+        반환값: (nickname, distance). 기준 거리 이상이면 nickname은 None 입니다.
+        """
+        names, matrix = self._state
+        if not names:
+            return None, None
+
+        query = represent(face_image)
+        distances = 1.0 - matrix @ query  # 정규화된 벡터이므로 코사인 거리
+        best = int(np.argmin(distances))
+        distance = float(distances[best])
+        if distance < threshold:
+            return names[best], distance
+        return None, distance
+
+
+# 프로세스 전역에서 공유하는 인덱스
+face_index = FaceEmbeddingIndex()
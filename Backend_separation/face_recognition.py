@@ -2,17 +2,17 @@ import asyncio
 import logging
 import os
 import time
-from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
 from emotion_record import get_most_frequent_emotion, save_emotion_result, save_most_emotion_pic
-from mqtt_client import video_frames
-import boto3
+from mqtt_client import frame_buffers
 import cv2
 import numpy as np
-from deepface import DeepFace
-from s3_uploader import upload_to_s3
-
-from emotion_record import get_most_frequent_emotion, save_emotion_result, get_emotion_file_today, save_most_emotion_pic
-from emotion_video import generate_video_filename, save_frames_to_video
+from s3_uploader import upload_queue
+from face_index import face_index
+from inference_pool import InferencePool, DroppedError
+from emotion_classifier import emotion_classifier
+from highlight_recorder import highlight_recorder
+from face_tracker import FaceTracker, MotionGate
 
 logging.basicConfig(level=logging.INFO)
 
@@ -23,151 +23,233 @@ model_path = os.path.join(current_dir, 'models', 'res10_300x300_ssd_iter_140000.
 faces_dir = os.path.join(current_dir, 'faces')  # faces 폴더의 절대 경로
 
 model = cv2.dnn.readNetFromCaffe(prototxt_path, model_path)
-last_detected_nicknames = []
-last_detected_distances = []
-last_detected_rectangles = []
-last_face_positions = []
-last_detected_emotions = []
-last_detected_emotion_scores = []
-faces = []
-executor = ThreadPoolExecutor(max_workers=4)
-
-def detect_faces(frame):
-    global faces, last_face_positions
-    h, w = frame.shape[:2]
-    blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
-    model.setInput(blob)
-    detections = model.forward()
-
-    faces.clear()
 
-    for i in range(detections.shape[2]):
-        confidence = detections[0, 0, i, 2]
-        if confidence > 0.8:  # 신뢰도가 0.8 이상인 경우만 처리
-            box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
+# 인식 스케줄러 설정
+TRACK_DETECT_INTERVAL = 0.5  # 움직임은 없지만 얼굴이 있을 때 검출 간격 (트랙 유지용)
+IDLE_DETECT_INTERVAL = 5.0  # 움직임도 얼굴도 없을 때 검출 간격 (가만히 있는 사람 대비)
+MIN_DETECT_INTERVAL = float(os.getenv("MIN_DETECT_INTERVAL", "0.2"))  # 움직임이 계속돼도 소스별로 이 간격보다 자주 검출하지 않음 (초)
+EMOTION_SAMPLE_INTERVAL = float(os.getenv("EMOTION_SAMPLE_INTERVAL", "1.0"))  # 트랙별 감정 분류 간격 (초)
+DETECT_SIZE = (300, 300)
+DETECT_MEAN = (104.0, 177.0, 123.0)
+DETECT_CONFIDENCE = 0.8  # 신뢰도가 0.8 이상인 경우만 처리
+
+
+class FaceResults(NamedTuple):
+    """한 소스의 최근 인식 결과. 워커가 통째로 교체하므로 읽는 쪽은 중간 상태를 보지 않습니다."""
+    positions: Optional[list]  # [(x, y, w, h)], 얼굴이 없으면 None
+    nicknames: list
+    distances: list
+    emotions: list
+    emotion_scores: list
+
+
+EMPTY_RESULTS = FaceResults(None, ["unknown"], [None], ["unknown"], [{}])
+
+
+class FaceSource:
+    """카메라 하나의 프레임 버퍼, 움직임 감지, 얼굴 트랙과 최근 결과"""
+
+    def __init__(self, name, buffer, recorder=None):
+        self.name = name
+        self.buffer = buffer
+        self.recorder = recorder  # 하이라이트 기록기 (없으면 하이라이트를 만들지 않음)
+        self.tracker = FaceTracker()
+        self.motion_gate = MotionGate()
+        self.results = EMPTY_RESULTS
+        self.last_seq = 0
+        self.due_seq = 0  # 다음 배치에서 검출할 프레임 번호 (0 = 없음)
+        self.last_detect = 0.0
+        self.detections = 0
+        self.skipped = 0
+        self.throttled = 0  # 움직임은 있었지만 MIN_DETECT_INTERVAL 안이라 건너뛴 프레임 수
+
+    def detect_interval(self):
+        """움직임이 없을 때 다음 검출까지 기다릴 시간"""
+        if self.tracker.tracks:
+            return TRACK_DETECT_INTERVAL
+        return IDLE_DETECT_INTERVAL
+
+    def publish(self, tracks):
+        if not tracks:
+            self.results = EMPTY_RESULTS
+            return
+        self.results = FaceResults(
+            positions=[track.box for track in tracks],
+            nicknames=[track.nickname for track in tracks],
+            distances=[track.distance for track in tracks],
+            emotions=[track.emotion for track in tracks],
+            emotion_scores=[track.emotion_scores for track in tracks],
+        )
+
+    def stats(self):
+        return {
+            "frames": self.motion_gate.frames,
+            "motion_frames": self.motion_gate.motion_frames,
+            "detections": self.detections,
+            "skipped": self.skipped,
+            "throttled": self.throttled,
+            "tracks": self.tracker.stats(),
+        }
+
+
+# 하이라이트 기록기는 로봇 카메라의 JPEG만 보관하므로 로봇 소스에만 연결
+sources = {name: FaceSource(name, buffer, highlight_recorder if name == "robot" else None)
+           for name, buffer in frame_buffers.items()}
+scheduler_stats = {"batches": 0, "batched_frames": 0}
+_batch_ready = None  # 검출할 프레임이 생기면 set되는 asyncio.Event
+
+
+def detect_faces(frames):
+    """
+    여러 소스의 프레임을 한 blob으로 쌓아 한 번의 forward로 검출합니다.
+    반환값: 프레임마다 [(x, y, w, h)] 목록
+    """
+    blob = cv2.dnn.blobFromImages([cv2.resize(frame, DETECT_SIZE) for frame in frames],
+                                  1.0, DETECT_SIZE, DETECT_MEAN)
+    model.setInput(blob)
+    detections = model.forward()  # (1, 1, N, 7): [image_id, label, confidence, x1, y1, x2, y2]
+
+    faces = [[] for _ in frames]
+    for detection in detections[0, 0]:
+        confidence = detection[2]
+        if confidence > DETECT_CONFIDENCE:
+            image_id = int(detection[0])
+            if not 0 <= image_id < len(frames):
+                continue
+            h, w = frames[image_id].shape[:2]
+            box = detection[3:7] * np.array([w, h, w, h])
             (startX, startY, endX, endY) = box.astype("int")
-            faces.append((startX, startY, endX - startX, endY - startY))
-
-    last_face_positions = faces if faces else None  # 얼굴이 감지되지 않은 경우 None으로 설정
-
-async def recognize_faces(frame):
-    global last_detected_nicknames, last_detected_distances, last_detected_rectangles, last_face_positions
-
-    if last_face_positions is None:
-        last_detected_nicknames = ["unknown"]
-        last_detected_distances = [None]
-        last_detected_rectangles = []
-        return
-
-    last_detected_nicknames.clear()
-    last_detected_distances.clear()
-    last_detected_rectangles.clear()
-
-    for idx, (x, y, w, h) in enumerate(last_face_positions):
-        face_image = frame[y:y + h, x:x + w]
+            faces[image_id].append((startX, startY, endX - startX, endY - startY))
+    return faces
+
+
+def recognize_faces(frame, tracker, tracks, now):
+    """
+    신원 캐시에 없는 트랙(새 트랙, 모르는 얼굴)과 재확인 시점이 된 트랙만 얼굴 인덱스에서 찾습니다.
+    나머지 트랙은 이전에 인식한 신원을 그대로 사용합니다.
+    """
+    for track in tracks:
+        if not tracker.needs_recognition(track, now):
+            continue
+        x, y, w, h = track.box
+        face_image = frame[max(y, 0):y + h, max(x, 0):x + w]
+        if face_image.size == 0:
+            track.last_recognized = now
+            continue
 
         try:
-            result = DeepFace.find(face_image, db_path=faces_dir, model_name='VGG-Face', enforce_detection=False)
-
-            if result and len(result) > 0:
-                threshold = 0.4
-                filtered_results = [res for res in result if res['distance'].values[0] < threshold]
-
-                if filtered_results:
-                    matched_face_path = filtered_results[0]['identity'].values[0]
-                    last_detected_distances.append(filtered_results[0]['distance'].values[0])
-                    last_detected_nicknames.append(get_nickname_from_filename(matched_face_path))
-                    last_detected_rectangles.append(last_face_positions[idx])  # 초록색 사각형 정보 추가
-                else:
-                    last_detected_nicknames.append("unknown")
-                    last_detected_distances.append(None)
-                    last_detected_rectangles.append(None)
-            else:
-                last_detected_nicknames.append("unknown")
-                last_detected_distances.append(None)
-                last_detected_rectangles.append(None)
-
+            nickname, distance = face_index.search(face_image)  # 거리 기준(0.4)을 넘으면 nickname은 None
         except Exception as e:
             print("Error in face recognition:", e)
-            last_detected_nicknames.append("unknown")
-            last_detected_distances.append(None)
-            last_detected_rectangles.append(None)
-
-
-async def recognize_emotion(frame):
-    global last_detected_emotions, last_detected_emotion_scores, last_face_positions
-    detected_person_name = last_detected_nicknames[0] if last_detected_nicknames else "unknown"
-
-    if detected_person_name == "unknown":
-        last_detected_emotions = ["unknown"]
-        last_detected_emotion_scores = [{}]
-        return
-
-    most_frequent_emotion = get_most_frequent_emotion(detected_person_name)
-
-    if last_face_positions is None:
-        last_detected_emotions = ["unknown"]
-        last_detected_emotion_scores = [{}]
-        return
-
-    last_detected_emotions.clear()
-    last_detected_emotion_scores.clear()
-
-    for (x, y, w, h) in last_face_positions:
-        face_image = frame[y:y + h, x:x + w]
-
-        try:
-            emotion_result = DeepFace.analyze(face_image, actions=['emotion'], enforce_detection=False)
-            if emotion_result:
-                current_emotion = emotion_result[0]['dominant_emotion']
-                last_detected_emotions.append(current_emotion)
-                last_detected_emotion_scores.append(emotion_result[0]['emotion'])
-
-
-                if current_emotion != 'neutral' and detected_person_name != "unknown":
-                    #emotion_today_{detected_person_name}.json 으로 감정 수치 저장
-                    save_emotion_result(detected_person_name, current_emotion)
-                    #최다 감정 사진 저장
-                    new_most_frequent_emotion = get_most_frequent_emotion(detected_person_name)
-                    if new_most_frequent_emotion != most_frequent_emotion:
-                        save_most_emotion_pic(frame, new_most_frequent_emotion, detected_person_name)
-                        logging.info(f"Updated most emotion photo for {detected_person_name} with emotion: {new_most_frequent_emotion}")
+            track.last_recognized = now
+            continue
 
+        previous = track.nickname
+        if tracker.apply_recognition(track, nickname, distance, now):
+            if previous == "unknown":
+                logging.info(f"트랙 {track.track_id} 인식: {nickname} ({distance:.2f})")
             else:
-                last_detected_emotions.append("unknown")
-                last_detected_emotion_scores.append({})
-
-        except Exception as e:
-            print("Error in emotion recognition:", e)
-            last_detected_emotions.append("unknown")
-            last_detected_emotion_scores.append({})
-
-def draw_faces(frame):
-    global last_face_positions, last_detected_nicknames, last_detected_distances, last_detected_emotions, \
-        last_detected_emotion_scores
-    if last_face_positions is None:
+                logging.info(f"트랙 {track.track_id} 신원 변경: {previous} -> {track.nickname}")
+
+
+def recognize_emotion(frame, tracks, now):
+    """
+    인식된 트랙 중 감정 샘플링 간격이 지난 것만 분류합니다.
+    반환값: 이번에 감정이 갱신된 트랙 목록
+    """
+    due = [track for track in tracks if track.is_known and now - track.last_emotion >= EMOTION_SAMPLE_INTERVAL]
+
+    # 한 프레임의 얼굴 crop을 모두 모아 한 번에 분류
+    face_images = []
+    sampled = []
+    for track in due:
+        x, y, w, h = track.box
+        face_image = frame[max(y, 0):y + h, max(x, 0):x + w]
+        if face_image.size > 0:
+            face_images.append(face_image)
+            sampled.append(track)
+    if not face_images:
+        return []
+
+    try:
+        results = emotion_classifier.classify(face_images)
+    except Exception as e:
+        print("Error in emotion recognition:", e)
+        return []
+
+    for track, (current_emotion, scores) in zip(sampled, results):
+        track.emotion = current_emotion
+        track.emotion_scores = scores
+        track.last_emotion = now
+
+        if current_emotion != 'neutral':
+            most_frequent_emotion = get_most_frequent_emotion(track.nickname)
+            #메모리 감정 집계에 반영하고 갱신된 최다 감정을 받음 (파일 기록은 주기적으로)
+            new_most_frequent_emotion = save_emotion_result(track.nickname, current_emotion)
+            #최다 감정 사진 저장
+            if new_most_frequent_emotion is not None and new_most_frequent_emotion != most_frequent_emotion:
+                save_most_emotion_pic(frame, new_most_frequent_emotion, track.nickname)
+                logging.info(f"Updated most emotion photo for {track.nickname} with emotion: {new_most_frequent_emotion}")
+    return sampled
+
+
+def process_frame(batch):
+    """
+    추론 워커 스레드에서 실행되는 전체 인식 파이프라인. batch는 [(FaceSource, 프레임 번호)].
+    검출은 모든 소스를 한 번에, 인식은 신원 캐시에 없는 트랙만, 감정은 트랙별 샘플링 간격마다 실행합니다.
+    반환값: [(FaceSource, 이번에 감정이 갱신된 트랙 목록)]
+    """
+    frames = []
+    with inference_pool.stage("decode"):
+        for source, seq in batch:
+            # 처리하는 동안 링 버퍼 슬롯이 덮어써질 수 있으므로 이 프레임만 복사
+            frame = source.buffer.get(seq, copy=True)
+            if frame is not None:  # 그사이 덮어써진 프레임은 이번 배치에서 빠짐
+                frames.append((source, frame))
+    if not frames:
+        return []
+    batch = frames
+
+    now = time.monotonic()
+    with inference_pool.stage("detect"):
+        faces = detect_faces([frame for _, frame in batch])
+
+    results = []
+    for (source, frame), boxes in zip(batch, faces):
+        tracks = source.tracker.update(boxes, now)
+        with inference_pool.stage("recognize"):
+            recognize_faces(frame, source.tracker, tracks, now)
+        with inference_pool.stage("emotion"):
+            sampled = recognize_emotion(frame, tracks, now)
+        source.publish(tracks)
+        results.append((source, sampled))
+    return results
+
+
+inference_pool = InferencePool(process_frame, max_workers=1, max_queue=2, name="face-inference")
+
+def draw_faces(frame, source="robot"):
+    results = sources[source].results
+    if results.positions is None:
         return frame
 
-    for idx, (x, y, w, h) in enumerate(last_face_positions):
+    for idx, (x, y, w, h) in enumerate(results.positions):
         # 얼굴 감지 사각형 (노란색)
         cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 255), 2)  # 노란색
 
         # 감정 정보가 있는지 확인하고 그리기
-        if last_detected_emotions and idx < len(last_detected_emotions):
-            emotion = last_detected_emotions[idx]
-            if emotion:
-                scores = last_detected_emotion_scores[idx]
-                if scores:
-                    sorted_emotions = sorted(scores.items(), key=lambda item: item[1], reverse=True)
-                    top_emotion, top_score = sorted_emotions[0]
-                    cv2.putText(frame, f"{top_emotion}: {top_score:.2f}%", (x + w + 10, y + 25),
-                                cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 255), 2)  # 빨간색
+        scores = results.emotion_scores[idx]
+        if results.emotions[idx] and scores:
+            sorted_emotions = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            top_emotion, top_score = sorted_emotions[0]
+            cv2.putText(frame, f"{top_emotion}: {top_score:.2f}%", (x + w + 10, y + 25),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 255), 2)  # 빨간색
 
         # 인식된 얼굴에 대해서는 초록색 사각형
-        if idx < len(last_detected_nicknames) and last_detected_nicknames[idx] != "unknown":
+        nickname = results.nicknames[idx]
+        distance = results.distances[idx]
+        if nickname != "unknown":
             cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)  # 초록색
-        nickname = last_detected_nicknames[idx] if idx < len(last_detected_nicknames) else "unknown"
-        distance = last_detected_distances[idx] if idx < len(last_detected_distances) else None
 
         if distance is not None:
             cv2.putText(frame, f"Detected: {nickname} ({distance:.2f})",
@@ -178,77 +260,105 @@ def draw_faces(frame):
 
     return frame
 
-def get_nickname_from_filename(filename):
-    base_name = filename.split('/')[-1]  # 파일 경로서 파일 이름만 추출
-    name_part = base_name.split('.')[0]  # 확장자 제거
-    name_part = name_part.split('(')[0].strip()  # 괄호 앞부분을 가져옴
-    return name_part
-
-
-async def recognize_periodically():
-    logging.info("얼굴 인식 업데이트 시작")
+async def gate_source(source):
+    """
+    소스의 매 프레임마다 저비용 움직임 감지를 실행하고, 움직임이 있으면 바로 검출 대상으로 표시합니다.
+    움직임이 없으면 트랙이 있을 때는 TRACK_DETECT_INTERVAL, 없을 때는 IDLE_DETECT_INTERVAL마다만 표시합니다.
+    움직임이 있어도 마지막 검출 후 MIN_DETECT_INTERVAL이 지나지 않았으면 건너뜁니다.
+    움직임 감지도 JPEG 디코딩이므로 executor에서 실행하고, 그동안 들어온 프레임은 건너뜁니다.
+    """
+    loop = asyncio.get_running_loop()
     while True:
         try:
-            frame = video_frames[-1]
-            detect_faces(frame)
-            await recognize_faces(frame)
-            await recognize_emotion(frame)
-            await create_video_highlight()
-            logging.info("인식 완료")
-        except IndexError:
-            logging.info("리스트가 비어 있습니다.")
-        finally:
-            await asyncio.sleep(2)
-
+            source.last_seq, jpeg = await source.buffer.wait_newer_jpeg(source.last_seq)
+            motion = await loop.run_in_executor(None, source.motion_gate.update, jpeg)
+            elapsed = time.monotonic() - source.last_detect
+            if not motion and elapsed < source.detect_interval():
+                source.skipped += 1
+                continue
+            if motion and elapsed < MIN_DETECT_INTERVAL:
+                source.throttled += 1
+                continue
+            # 워커가 이전 배치를 처리하는 동안 계속 최신 프레임으로 갱신됨
+            source.due_seq = source.last_seq
+            _batch_ready.set()
+        except Exception as e:
+            logging.error(f"{source.name} 움직임 감지 중 오류 발생: {e}")
+            await asyncio.sleep(1)
 
 
-is_saving_video = False  # 비디오 저장 중인지 여부를 나타내는 플래그
+def collect_batch():
+    """검출 대상으로 표시된 소스와 프레임 번호를 모읍니다. 디코딩은 추론 워커가 합니다."""
+    batch = []
+    now = time.monotonic()
+    for source in sources.values():
+        if not source.due_seq:
+            continue
+        batch.append((source, source.due_seq))
+        source.due_seq = 0
+        source.last_detect = now
+        source.detections += 1
+    return batch
 
 
-async def create_video_highlight():
-    global is_saving_video  # 플래그를 전역으로 사용
+async def recognize_periodically():
+    """
+    소스별 움직임 감지 태스크가 표시한 프레임을 한 배치로 모아 추론 워커에 넘깁니다.
+    배치를 처리하는 동안 들어온 프레임은 다음 배치에 함께 실려서, 카메라가 늘어도 forward 횟수는 늘지 않습니다.
+    """
+    global _batch_ready
+    logging.info(f"얼굴 인식 업데이트 시작: {', '.join(sources)}")
+    inference_pool.start()
+    _batch_ready = asyncio.Event()
+    for source in sources.values():
+        asyncio.create_task(gate_source(source))
 
+    while True:
+        try:
+            await _batch_ready.wait()
+            _batch_ready.clear()
+            batch = collect_batch()
+            if not batch:
+                continue
+            scheduler_stats["batches"] += 1
+            scheduler_stats["batched_frames"] += len(batch)
+            for source, sampled in await inference_pool.submit(batch):
+                await create_video_highlight(source, sampled)
+        except DroppedError:
+            continue  # 더 최신 배치에 자리를 내줌
+        except Exception as e:
+            logging.error(f"얼굴 인식 중 오류 발생: {e}")
+            await asyncio.sleep(1)
 
-    current_emotions = last_detected_emotions
-    current_emotion_scores = last_detected_emotion_scores
-    current_nickname = last_detected_nicknames
 
-    if current_nickname != "unkown" and current_emotions and not is_saving_video:  # 비디오 저장 중이 아닐 때만 실행
-        for idx, emotion in enumerate(current_emotions):
-            score = current_emotion_scores[idx].get(emotion, 0)
-            if emotion != "neutral" and score >= 0.4:
-                asyncio.create_task(save_video())
+def scheduler_stats_snapshot():
+    batches = scheduler_stats["batches"]
+    return {
+        **scheduler_stats,
+        "throttled": sum(source.throttled for source in sources.values()),
+        "avg_batch_size": round(scheduler_stats["batched_frames"] / batches, 2) if batches else 0,
+        "sources": {name: source.stats() for name, source in sources.items()},
+    }
 
 
-async def save_video(fps=10, seconds=20):
-    logging.info("비디오 저장 시작##########################################")
-    global is_saving_video
-    is_saving_video = True  # 비디오 저장 시작
-    if not video_frames :
-        logging.info("비디오 프레임이 없습니다.")
-        is_saving_video = False
+async def create_video_highlight(source, sampled):
+    """이번에 감정이 새로 분류된 트랙 중 뚜렷한 감정이 있으면 하이라이트를 저장합니다."""
+    if source.recorder is None or source.recorder.is_recording:  # 비디오 저장 중이 아닐 때만 실행
         return
-
-    detected_person_name = last_detected_nicknames[0] if last_detected_nicknames else "unknown"
-    detected_emotion = last_detected_emotions[0] if last_detected_emotions else "unknown"
-    video_file_name = f'{detected_person_name}_{detected_emotion}_{time.strftime("%Y%m%d_%H%M%S")}.mp4'
-    first_frame = video_frames[0]
-    h, w = first_frame.shape[:2]
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(video_file_name, fourcc, fps, (w, h))
-
-    start_time = time.time()
-    end_time = start_time + seconds
-
-    while time.time() < end_time:
-        if video_frames:
-            frame = video_frames[-1]  # 가장 최근 프레임 사용
-            out.write(frame)
-        await asyncio.sleep(1 / fps)  # fps에 맞춰 대기
-
-    out.release()  # 비디오 파일 닫기
-    is_saving_video = False
-    logging.info("비디오 저장 완료##########################################")
-    
-    # S3에 저장하는 함수 호출
-    await upload_to_s3(video_file_name)
+    for track in sampled:
+        score = track.emotion_scores.get(track.emotion, 0)
+        if track.is_known and track.emotion != "neutral" and score >= 0.4:
+            save_video(source.recorder, track.nickname, track.emotion)
+            break
+
+
+def save_video(recorder, person_name, emotion):
+    """
+    감지 직전(pre-roll)부터 이후(post-roll)까지의 원본 JPEG를 하이라이트로 저장합니다.
+    파일 작성은 기록기의 백그라운드 스레드가 처리하므로 바로 반환합니다.
+    """
+    def on_saved(clip):
+        # 감지 시점의 JPEG를 그대로 썸네일로 사용하고, 업로드는 업로드 큐의 워커가 처리
+        upload_queue.enqueue(clip.path, thumbnail_jpeg=clip.trigger_jpeg)
+
+    recorder.trigger(person_name, emotion, on_saved=on_saved)
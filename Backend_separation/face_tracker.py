@@ -0,0 +1,228 @@
+# face_tracker.py
+# 프레임 사이에서 얼굴을 이어 붙이는 트래커와 저비용 움직임 감지
+#
+# 검출된 얼굴 박스를 이전 트랙과 IoU(겹치지 않으면 중심점 거리)로 매칭해서
+# 같은 사람에게 같은 트랙을 유지합니다. 무거운 인식은 새 트랙에만 돌리고,
+# 움직임이 없고 트랙도 없을 때는 검출 자체를 드물게 실행하도록 스케줄러가 사용합니다.
+#
+# 한 번 인식된 트랙은 트랙이 사라질 때까지 신원을 재사용하고(트랙 단위 신원 캐시),
+# REVERIFY_INTERVAL마다 한 번씩만 다시 인식해서 결과가 연속으로 어긋나면 신원을 바꿉니다.
+
+import itertools
+import time
+
+import cv2
+import numpy as np
+
+IOU_THRESHOLD = 0.3  # 이 이상 겹치면 같은 얼굴
+CENTROID_RATIO = 0.5  # IoU가 낮아도 중심점이 박스 크기의 50% 이내면 같은 얼굴 (빠른 이동)
+MAX_MISSES = 3  # 연속으로 이 횟수만큼 검출되지 않으면 트랙 삭제
+
+UNKNOWN_RETRY_INTERVAL = 1.0  # 인식되지 않은 트랙을 다시 인식하는 간격 (초)
+REVERIFY_INTERVAL = 30.0  # 인식된 트랙의 신원을 다시 확인하는 간격 (초)
+DISAGREE_LIMIT = 2  # 재확인 결과가 연속으로 이 횟수만큼 어긋나면 신원을 바꿈
+
+MOTION_PIXEL_THRESHOLD = 25  # 밝기 차이가 이 이상인 픽셀을 움직임으로 봄
+MOTION_RATIO = 0.01  # 움직인 픽셀 비율이 이 이상이면 움직임 있음
+
+
+def iou(a, b):
+    """(x, y, w, h) 박스 두 개의 IoU"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    inter_w = min(ax + aw, bx + bw) - max(ax, bx)
+    inter_h = min(ay + ah, by + bh) - max(ay, by)
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    inter = inter_w * inter_h
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+def centroid_distance(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    return ((ax + aw / 2 - bx - bw / 2) ** 2 + (ay + ah / 2 - by - bh / 2) ** 2) ** 0.5
+
+
+class FaceTrack:
+    def __init__(self, track_id, box, now):
+        self.track_id = track_id
+        self.box = box
+        self.first_seen = now
+        self.last_seen = now
+        self.misses = 0
+        # 인식 결과 (트랙이 유지되는 동안 재사용)
+        self.nickname = "unknown"
+        self.distance = None
+        self.last_recognized = 0.0
+        self.disagreements = 0  # 재확인 결과가 연속으로 어긋난 횟수
+        # 감정 결과 (트랙별로 일정 간격마다 갱신)
+        self.emotion = "unknown"
+        self.emotion_scores = {}
+        self.last_emotion = 0.0
+
+    @property
+    def is_known(self):
+        return self.nickname != "unknown"
+
+
+class FaceTracker:
+    """추론 워커 스레드 하나에서만 update()를 호출합니다."""
+
+    def __init__(self, iou_threshold=IOU_THRESHOLD, max_misses=MAX_MISSES, reverify_interval=REVERIFY_INTERVAL):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.reverify_interval = reverify_interval
+        self.tracks = []  # 살아 있는 트랙 (다른 스레드는 읽기만 함)
+        self._ids = itertools.count(1)
+        self.created = 0
+        self.lost = 0
+        # 신원 캐시 통계
+        self.recognitions = 0  # 실제로 얼굴 인덱스를 조회한 횟수
+        self.cache_hits = 0  # 인식된 트랙이라 조회를 건너뛴 횟수
+        self.reverifications = 0
+        self.identity_changes = 0
+
+    def _match_score(self, track, box):
+        overlap = iou(track.box, box)
+        if overlap >= self.iou_threshold:
+            return 1.0 + overlap
+        # IoU로 안 잡히는 빠른 이동은 중심점 거리로 보완 (항상 IoU 매칭보다 낮은 점수)
+        if centroid_distance(track.box, box) <= CENTROID_RATIO * max(track.box[2], track.box[3]):
+            return overlap
+        return None
+
+    def update(self, boxes, now=None):
+        """
+        이번 프레임의 검출 결과로 트랙을 갱신합니다.
+        반환값: 이번 프레임에 보인 트랙 목록 (boxes 순서)
+        """
+        now = now or time.monotonic()
+        candidates = []
+        for t, track in enumerate(self.tracks):
+            for b, box in enumerate(boxes):
+                score = self._match_score(track, box)
+                if score is not None:
+                    candidates.append((score, t, b))
+        candidates.sort(reverse=True)
+
+        # 점수가 높은 쌍부터 탐욕적으로 매칭
+        matched = {}
+        used_tracks = set()
+        for _, t, b in candidates:
+            if t in used_tracks or b in matched:
+                continue
+            used_tracks.add(t)
+            matched[b] = self.tracks[t]
+
+        visible = []
+        for b, box in enumerate(boxes):
+            track = matched.get(b)
+            if track is None:
+                track = FaceTrack(next(self._ids), box, now)
+                self.created += 1
+            track.box = box
+            track.last_seen = now
+            track.misses = 0
+            visible.append(track)
+
+        alive = list(visible)
+        for t, track in enumerate(self.tracks):
+            if t in used_tracks:
+                continue
+            track.misses += 1
+            if track.misses <= self.max_misses:
+                alive.append(track)
+            else:
+                self.lost += 1
+        self.tracks = alive
+        return visible
+
+    # ---------------------------------------------------------------- 신원 캐시
+    def needs_recognition(self, track, now):
+        """
+        이번 프레임에 이 트랙을 인식해야 하는지 판단합니다.
+        새 트랙은 바로, 모르는 얼굴이나 재확인이 어긋난 트랙은 UNKNOWN_RETRY_INTERVAL마다,
+        인식된 트랙은 reverify_interval마다만 조회합니다.
+        """
+        if not track.is_known or track.disagreements:
+            return now - track.last_recognized >= UNKNOWN_RETRY_INTERVAL
+        if now - track.last_recognized >= self.reverify_interval:
+            return True
+        self.cache_hits += 1
+        return False
+
+    def apply_recognition(self, track, nickname, distance, now):
+        """
+        인식 결과(거리 기준을 통과한 경우에만 nickname)를 트랙에 반영합니다.
+        신원이 바뀌었으면 True를 반환합니다.
+        """
+        self.recognitions += 1
+        track.last_recognized = now
+        if not track.is_known:
+            if nickname is None:
+                return False
+            track.nickname, track.distance = nickname, distance
+            return True
+
+        self.reverifications += 1
+        if nickname == track.nickname:
+            track.distance = distance
+            track.disagreements = 0
+            return False
+
+        # 한 번 어긋난 것은 각도/가림 때문일 수 있으므로 연속으로 어긋날 때만 신원을 바꿈
+        track.disagreements += 1
+        if track.disagreements < DISAGREE_LIMIT:
+            return False
+        track.nickname = nickname if nickname is not None else "unknown"
+        track.distance = distance if nickname is not None else None
+        track.disagreements = 0
+        track.last_emotion = 0.0  # 바뀐 사람의 감정을 바로 샘플링
+        self.identity_changes += 1
+        return True
+
+    def stats(self):
+        tracks = self.tracks
+        return {
+            "active": len(tracks),
+            "known": sum(1 for track in tracks if track.is_known),
+            "created": self.created,
+            "lost": self.lost,
+            "recognitions": self.recognitions,
+            "cache_hits": self.cache_hits,
+            "reverifications": self.reverifications,
+            "identity_changes": self.identity_changes,
+        }
+
+
+class MotionGate:
+    """
+    JPEG를 1/4 크기 흑백으로만 디코딩해서 이전 프레임과의 차이로 움직임을 판단합니다.
+    전체 디코딩보다 훨씬 싸서 매 프레임 실행할 수 있습니다.
+    """
+
+    def __init__(self, pixel_threshold=MOTION_PIXEL_THRESHOLD, ratio=MOTION_RATIO):
+        self.pixel_threshold = pixel_threshold
+        self.ratio = ratio
+        self._previous = None
+        self.frames = 0
+        self.motion_frames = 0
+
+    def update(self, jpeg):
+        small = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+        if small is None:
+            return False
+        small = cv2.GaussianBlur(small, (5, 5), 0)
+        previous, self._previous = self._previous, small
+        self.frames += 1
+        if previous is None or previous.shape != small.shape:
+            self.motion_frames += 1
+            return True  # 첫 프레임이나 해상도 변경은 움직임으로 취급
+
+        diff = cv2.absdiff(previous, small)
+        changed = np.count_nonzero(diff >= self.pixel_threshold)
+        motion = changed >= self.ratio * diff.size
+        if motion:
+            self.motion_frames += 1
+        return motion
@@ -0,0 +1,141 @@
+# family_cache.py
+# 가족 관계(familyship)와 username -> user_id 조회 결과를 캐시합니다.
+#
+# 가족 구성원은 거의 바뀌지 않으므로 TTL 동안 DB를 다시 읽지 않습니다.
+# Spring 백엔드의 FamilyService가 가족을 추가/삭제하면 POST /family/invalidate 로
+# 알려주고, 알림이 유실되더라도 TTL이 지나면 다시 조회됩니다.
+
+import logging
+import os
+import threading
+import time
+from typing import List
+
+from pydantic import BaseModel
+
+from db_pool import db_pool
+
+logger = logging.getLogger(__name__)
+
+FAMILY_TTL = float(os.getenv('FAMILY_CACHE_TTL', '300'))  # 초
+INTERNAL_API_KEY = os.getenv('INTERNAL_API_KEY')  # Spring 백엔드와 공유하는 무효화 요청용 키
+
+FAMILY_QUERY = """
+SELECT u.id, u.username FROM familyship f
+JOIN userentity u ON (u.id = f.user2_id OR u.id = f.user1_id)
+WHERE (f.user1_id = %s OR f.user2_id = %s) AND u.id != %s
+"""
+USER_ID_QUERY = "SELECT id FROM userentity WHERE username = %s"
+
+
+# /family/invalidate 요청 본문. user_ids가 비어 있으면 전체 캐시를 비웁니다.
+class FamilyInvalidation(BaseModel):
+    user_ids: List[int] = []
+
+
+class FamilyCache:
+    def __init__(self, ttl=FAMILY_TTL):
+        self.ttl = ttl
+        self._families = {}  # user_id -> (만료 시각, ((id, username), ...))
+        self._user_ids = {}  # username -> (만료 시각, user_id)
+        self._lock = threading.Lock()
+        self._generation = 0  # 무효화될 때마다 증가
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _get(self, table, key):
+        with self._lock:
+            item = table.get(key)
+            if item is not None and item[0] > time.monotonic():
+                self.hits += 1
+                return item[1]
+            self.misses += 1
+            return None
+
+    def _store(self, table, key, value, generation):
+        with self._lock:
+            # 조회하는 동안 무효화가 있었다면 이미 오래된 결과일 수 있으므로 저장하지 않음
+            if generation == self._generation:
+                table[key] = (time.monotonic() + self.ttl, value)
+
+    # ---------------------------------------------------------------- 가족 구성원
+    def family(self, user_id):
+        """user_id를 제외한 가족 구성원 ((id, username), ...) (동기)"""
+        members = self._get(self._families, user_id)
+        if members is None:
+            generation = self._generation
+            rows = db_pool.fetchall(FAMILY_QUERY, (user_id, user_id, user_id), name="family_members")
+            members = tuple((row[0], row[1]) for row in rows)
+            self._store(self._families, user_id, members, generation)
+        return members
+
+    async def afamily(self, user_id):
+        """family()의 비동기 버전"""
+        members = self._get(self._families, user_id)
+        if members is None:
+            generation = self._generation
+            rows = await db_pool.afetchall(FAMILY_QUERY, (user_id, user_id, user_id), name="family_members")
+            members = tuple((row[0], row[1]) for row in rows)
+            self._store(self._families, user_id, members, generation)
+        return members
+
+    # ---------------------------------------------------------------- username -> id
+    def user_id(self, username):
+        user_id = self._get(self._user_ids, username)
+        if user_id is None:
+            generation = self._generation
+            result = db_pool.fetchone(USER_ID_QUERY, (username,), name="user_id_by_username")
+            if result is None:
+                return None  # 없는 사용자는 캐시하지 않음
+            user_id = result[0]
+            self._store(self._user_ids, username, user_id, generation)
+        return user_id
+
+    async def auser_id(self, username):
+        user_id = self._get(self._user_ids, username)
+        if user_id is None:
+            generation = self._generation
+            result = await db_pool.afetchone(USER_ID_QUERY, (username,), name="user_id_by_username")
+            if result is None:
+                return None
+            user_id = result[0]
+            self._store(self._user_ids, username, user_id, generation)
+        return user_id
+
+    # ---------------------------------------------------------------- 무효화
+    def invalidate(self, user_ids=None):
+        """
+        주어진 사용자와, 그 사용자를 가족으로 가진 항목을 모두 지웁니다.
+        가족은 서로 모두 연결되어 있으므로 한 명이 추가/삭제되면 가족 전체의 목록이 바뀝니다.
+        user_ids가 없으면 전체를 비웁니다.
+        """
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            if not user_ids:
+                self._families.clear()
+                self._user_ids.clear()
+                return
+            targets = set(user_ids)
+            stale = [
+                user_id for user_id, (_, members) in self._families.items()
+                if user_id in targets or any(member_id in targets for member_id, _ in members)
+            ]
+            for user_id in stale:
+                del self._families[user_id]
+        logger.info(f"가족 캐시 무효화: users={sorted(targets)}, 제거 {len(stale)}건")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ttl": self.ttl,
+                "families": len(self._families),
+                "user_ids": len(self._user_ids),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+
+family_cache = FamilyCache()
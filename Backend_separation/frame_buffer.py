@@ -0,0 +1,155 @@
+# frame_buffer.py
+# 미리 할당한 고정 크기 프레임 링 버퍼 (복사 없이 읽기 전용 뷰를 제공)
+
+import asyncio
+import logging
+import threading
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class FrameRingBuffer:
+    """
+    프레임을 capacity개의 슬롯에 순환 저장합니다.
+    프레임마다 1부터 증가하는 시퀀스 번호가 붙고, 소비자는 읽기 전용 뷰를 받습니다.
+
+    put_jpeg()로 넣은 프레임은 압축된 상태로 보관하다가 처음 픽셀이 필요할 때 한 번만
+    디코딩해서 (capacity, h, w, 3) uint8 배열의 해당 슬롯에 기록합니다(memoize).
+    JPEG가 필요한 소비자(MJPEG 스트림 등)는 get_jpeg()로 원본 바이트를 그대로 받습니다.
+
+    뷰는 capacity개의 프레임이 더 들어오면 덮어써지므로,
+    오래 붙잡고 있어야 하는 소비자(추론 워커 등)는 copy=True로 받아야 합니다.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.seq = 0  # 마지막으로 기록된 프레임 번호 (0 = 아직 없음)
+        self.decoded_count = 0
+        self._frames = None
+        self._slot_seqs = [0] * capacity
+        self._jpegs = [None] * capacity
+        self._decoded = [False] * capacity
+        self._decode_lock = threading.Lock()
+        self._waiter = None
+
+    def __len__(self):
+        return min(self.seq, self.capacity)
+
+    def _ensure_allocated(self, shape):
+        if self._frames is None or self._frames.shape[1:] != shape:
+            # 첫 프레임이거나 해상도가 바뀐 경우에만 새로 할당
+            self._frames = np.empty((self.capacity,) + shape, dtype=np.uint8)
+            self._decoded = [False] * self.capacity
+            logger.info(f"프레임 버퍼 할당: {self._frames.shape}")
+
+    def _advance(self, jpeg):
+        seq = self.seq + 1
+        slot = seq % self.capacity
+        self._slot_seqs[slot] = seq
+        self._jpegs[slot] = jpeg
+        self._decoded[slot] = False
+        return seq, slot
+
+    def _notify(self, seq):
+        self.seq = seq
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(seq)
+        self._waiter = None
+
+    def put(self, frame):
+        """디코딩된 프레임을 다음 슬롯에 복사하고 대기 중인 소비자를 깨웁니다. (이벤트 루프에서 호출)"""
+        with self._decode_lock:
+            self._ensure_allocated(frame.shape)
+            seq, slot = self._advance(None)
+            self._frames[slot] = frame
+            self._decoded[slot] = True
+        self._notify(seq)
+        return seq
+
+    def put_jpeg(self, jpeg):
+        """압축된 JPEG 바이트만 저장합니다. 디코딩은 소비자가 픽셀을 요청할 때까지 미룹니다."""
+        with self._decode_lock:
+            seq, _ = self._advance(bytes(jpeg))
+        self._notify(seq)
+        return seq
+
+    def get_jpeg(self, seq):
+        """해당 번호 프레임의 원본 JPEG 바이트. put()으로 넣었거나 덮어써졌으면 None."""
+        if seq <= 0:
+            return None
+        slot = seq % self.capacity
+        jpeg = self._jpegs[slot]
+        return jpeg if self._slot_seqs[slot] == seq else None
+
+    def get(self, seq, copy=False):
+        """해당 번호의 프레임을 반환합니다. 이미 덮어써졌거나 디코딩에 실패하면 None."""
+        if seq <= 0:
+            return None
+        slot = seq % self.capacity
+        with self._decode_lock:
+            if self._slot_seqs[slot] != seq:
+                return None
+            if not self._decoded[slot]:
+                jpeg = self._jpegs[slot]
+                if jpeg is None:
+                    return None
+                image = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+                if image is None:
+                    logger.error(f"프레임 디코딩 실패: seq={seq}")
+                    return None
+                self._ensure_allocated(image.shape)
+                self._frames[slot] = image
+                self._decoded[slot] = True
+                self.decoded_count += 1
+            if copy:
+                return self._frames[slot].copy()
+            view = self._frames[slot].view()
+        view.flags.writeable = False
+        return view
+
+    def latest(self, copy=False):
+        """(seq, frame) 형태로 가장 최근 프레임을 반환합니다. 프레임이 없으면 (0, None)."""
+        seq = self.seq
+        return seq, self.get(seq, copy=copy)
+
+    def latest_jpeg(self):
+        seq = self.seq
+        return seq, self.get_jpeg(seq)
+
+    async def wait_seq(self, after_seq, timeout=None):
+        """
+        after_seq보다 새로운 프레임이 들어올 때까지 기다렸다가 최신 번호를 반환합니다.
+        반환된 번호가 after_seq + 1보다 크면 그 사이 프레임은 건너뛴(drop) 것입니다.
+        timeout이 지나면 asyncio.TimeoutError가 발생합니다.
+        """
+        while self.seq <= after_seq:
+            if self._waiter is None or self._waiter.done():
+                self._waiter = asyncio.get_running_loop().create_future()
+            await asyncio.wait_for(asyncio.shield(self._waiter), timeout)
+        return self.seq
+
+    async def wait_newer(self, after_seq, timeout=None, copy=False):
+        """wait_seq() 후 (seq, frame)을 반환합니다. 디코딩은 여기서 처음 한 번만 일어납니다."""
+        while True:
+            seq = await self.wait_seq(after_seq, timeout)
+            frame = self.get(seq, copy=copy)
+            if frame is not None:
+                return seq, frame
+            after_seq = seq  # 손상된 프레임은 건너뛰고 다음 프레임을 기다림
+
+    async def wait_newer_jpeg(self, after_seq, timeout=None):
+        """wait_seq() 후 (seq, jpeg bytes)를 반환합니다. 디코딩하지 않습니다."""
+        while True:
+            seq = await self.wait_seq(after_seq, timeout)
+            jpeg = self.get_jpeg(seq)
+            if jpeg is not None:
+                return seq, jpeg
+            after_seq = seq
+
+    @staticmethod
+    def dropped_between(last_seq, seq):
+        """두 번호 사이에 건너뛴 프레임 수"""
+        return max(0, seq - last_seq - 1) if last_seq else 0
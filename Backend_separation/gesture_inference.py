@@ -0,0 +1,112 @@
+# gesture_inference.py
+# 손동작 LSTM 모델을 Keras predict 없이 NumPy만으로 추론하는 경량 forward pass
+
+import logging
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+class NumpyGestureModel:
+    """
+    create_model()의 LSTM(64) -> Dense(32, relu) -> Dense(3, softmax) 구조를
+    Keras 가중치로 그대로 계산합니다. (1, 30, 99) 샘플 하나에 대해
+    model.predict의 프레임워크 오버헤드 없이 행렬 곱 몇 번으로 끝납니다.
+    """
+
+    def __init__(self, kernel, recurrent_kernel, bias, dense1_w, dense1_b, dense2_w, dense2_b):
+        self.kernel = np.asarray(kernel, dtype=np.float32)  # (99, 4U)
+        self.recurrent_kernel = np.asarray(recurrent_kernel, dtype=np.float32)  # (U, 4U)
+        self.bias = np.asarray(bias, dtype=np.float32)  # (4U,)
+        self.dense1_w = np.asarray(dense1_w, dtype=np.float32)
+        self.dense1_b = np.asarray(dense1_b, dtype=np.float32)
+        self.dense2_w = np.asarray(dense2_w, dtype=np.float32)
+        self.dense2_b = np.asarray(dense2_b, dtype=np.float32)
+        self.units = self.recurrent_kernel.shape[0]
+
+    @classmethod
+    def from_keras(cls, model):
+        """create_model()로 만든 Keras 모델에서 가중치를 꺼내옵니다."""
+        from tensorflow.keras.layers import LSTM, Dense
+
+        lstm = next(layer for layer in model.layers if isinstance(layer, LSTM))
+        dense1, dense2 = [layer for layer in model.layers if isinstance(layer, Dense)]
+        return cls(*lstm.get_weights(), *dense1.get_weights(), *dense2.get_weights())
+
+    def predict(self, x):
+        """x: (batch, 30, 99) -> (batch, 3) softmax 확률"""
+        x = np.asarray(x, dtype=np.float32)
+        batch, steps, _ = x.shape
+        u = self.units
+
+        # 입력 쪽 가중치 곱은 모든 타임스텝을 한 번에 계산
+        x_proj = x @ self.kernel + self.bias  # (batch, steps, 4U)
+        h = np.zeros((batch, u), dtype=np.float32)
+        c = np.zeros((batch, u), dtype=np.float32)
+
+        # Keras LSTM 게이트 순서: input, forget, cell, output
+        for t in range(steps):
+            z = x_proj[:, t] + h @ self.recurrent_kernel
+            i = _sigmoid(z[:, :u])
+            f = _sigmoid(z[:, u:2 * u])
+            g = np.tanh(z[:, 2 * u:3 * u])
+            o = _sigmoid(z[:, 3 * u:])
+            c = f * c + i * g
+            h = o * np.tanh(c)
+
+        y = np.maximum(h @ self.dense1_w + self.dense1_b, 0.0)
+        logits = y @ self.dense2_w + self.dense2_b
+        logits -= logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+
+def check_parity_and_benchmark(keras_model, runs=200):
+    """Keras 출력과의 오차 및 호출당 지연 시간을 비교합니다."""
+    fast_model = NumpyGestureModel.from_keras(keras_model)
+    rng = np.random.default_rng(0)
+    samples = rng.normal(size=(32, 30, 99)).astype(np.float32)
+
+    expected = keras_model.predict(samples, verbose=0)
+    actual = fast_model.predict(samples)
+    max_diff = float(np.max(np.abs(expected - actual)))
+    same_argmax = bool(np.all(expected.argmax(axis=1) == actual.argmax(axis=1)))
+
+    sample = samples[:1]
+    start = time.perf_counter()
+    for _ in range(runs):
+        keras_model.predict(sample, verbose=0)
+    keras_ms = (time.perf_counter() - start) / runs * 1000
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        fast_model.predict(sample)
+    numpy_ms = (time.perf_counter() - start) / runs * 1000
+
+    return {
+        "max_abs_diff": max_diff,
+        "same_argmax": same_argmax,
+        "keras_predict_ms": round(keras_ms, 3),
+        "numpy_ms": round(numpy_ms, 3),
+    }
+
+
+if __name__ == "__main__":
+    # 모델 파일로 Keras와 결과가 같은지, 얼마나 빨라지는지 확인
+    import os
+    from hand_gesture_recognition import create_model
+
+    logging.basicConfig(level=logging.INFO)
+    model_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "model.keras")
+    keras_model = create_model()
+    keras_model.load_weights(model_path)
+
+    result = check_parity_and_benchmark(keras_model)
+    logger.info(f"parity/benchmark 결과: {result}")
+    assert result["max_abs_diff"] < 1e-4 and result["same_argmax"], "Keras 출력과 일치하지 않습니다."
@@ -5,24 +5,31 @@ import numpy as np
 import mediapipe as mp
 import tensorflow as tf 
 import asyncio
-from video_processing import video_frames
+import threading
+from collections import deque
+from mqtt_client import frame_buffer, MAX_FRAMES
 from tensorflow.keras.layers import Input, LSTM, Dense
 from tensorflow.keras.models import Model
+from gesture_inference import NumpyGestureModel
 
 # 전역 변수
 actions = ['come', 'away', 'spin']
 seq_length = 30
 model = None
+fast_model = None
 mp_hands = mp.solutions.hands
 mp_drawing = mp.solutions.drawing_utils
 hands = None
-seq = []
-action_seq = []
+action_seq = deque(maxlen=5)  # 최근 예측 5개 (기준 5번 연속)
 last_action = None
 this_action = '?'
 hand_landmarks = None
 hand_gesture_action = '?'
 hand_gesture_landmarks = None
+latest_landmarks = (0, None)  # (프레임 번호, MediaPipe multi_hand_landmarks) 인식 루프의 최근 결과
+# 오버레이 렌더링은 executor 스레드에서 읽으므로 결과 교체/읽기만 잠금 (MediaPipe 실행은 잠그지 않음)
+landmark_lock = threading.Lock()
+LANDMARK_MAX_AGE = MAX_FRAMES  # 오버레이 프레임보다 이만큼 이상 오래된 결과는 그리지 않음
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -35,7 +42,7 @@ def create_model():
     return Model(inputs=input_layer, outputs=output)
 
 def init():
-    global model, hands
+    global model, fast_model, hands
     model_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".", "models", "model.keras")
     try:
         if os.path.exists(model_path):
@@ -56,6 +63,10 @@ def init():
             # 모델 컴파일
             model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
             logger.info("모델 컴파일 완료")
+
+            # 프레임마다 호출되는 추론은 Keras predict 대신 NumPy forward pass 사용
+            fast_model = NumpyGestureModel.from_keras(model)
+            logger.info("NumPy 추론 모델 준비 완료")
         else:
             logger.error(f"모델 파일을 찾을 수 없습니다: {model_path}")
             return False
@@ -78,36 +89,92 @@ def init():
     
     return True
 
-def recognize_and_store_gesture(img):
-    global seq, action_seq, this_action, hand_landmarks
-    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-    result = hands.process(img_rgb)
+# 관절 벡터/각도 계산에 쓰는 인덱스 (매 프레임 새로 만들지 않도록 모듈 상수로 둠)
+JOINT_PARENT = np.array([0, 1, 2, 3, 0, 5, 6, 7, 0, 9, 10, 11, 0, 13, 14, 15, 0, 17, 18, 19])
+JOINT_CHILD = np.array([1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20])
+ANGLE_A = np.array([0, 1, 2, 4, 5, 6, 8, 9, 10, 12, 13, 14, 16, 17, 18])
+ANGLE_B = np.array([1, 2, 3, 5, 6, 7, 9, 10, 11, 13, 14, 15, 17, 18, 19])
+NUM_FEATURES = 21 * 4 + len(ANGLE_A)  # 99
+
+
+def extract_features(joint):
+    """(21, 4) 관절 배열 -> 99차원 특징 벡터 (관절 좌표 84개 + 관절 사이 각도 15개)"""
+    out = np.empty(NUM_FEATURES, dtype=np.float32)
+
+    v = joint[JOINT_CHILD, :3] - joint[JOINT_PARENT, :3]
+    v /= np.linalg.norm(v, axis=1, keepdims=True)
+    cos = np.einsum('nt,nt->n', v[ANGLE_A], v[ANGLE_B])
+
+    out[:84] = joint.reshape(-1)
+    out[84:] = np.degrees(np.arccos(cos))
+    return out
+
+
+class GestureSequenceBuffer:
+    """
+    최근 seq_length개의 특징 벡터만 보관하는 고정 크기 링 버퍼.
+    같은 행을 두 군데(i, i + length)에 써 두어서 window()가 항상 복사 없는 연속 뷰를 반환합니다.
+    """
 
-    if result.multi_hand_landmarks is not None:
-        for hand_landmarks in result.multi_hand_landmarks:
-            joint = np.zeros((21, 4))
-            for j, lm in enumerate(hand_landmarks.landmark):
-                joint[j] = [lm.x, lm.y, lm.z, lm.visibility]
+    def __init__(self, length, num_features):
+        self.length = length
+        self._data = np.zeros((2 * length, num_features), dtype=np.float32)
+        self._head = 0  # 다음에 쓸 위치
+        self._count = 0
 
-            # Calculate angles between joints
-            v1 = joint[[0, 1, 2, 3, 0, 5, 6, 7, 0, 9, 10, 11, 0, 13, 14, 15, 0, 17, 18, 19], :3]
-            v2 = joint[[1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20], :3]
-            v = v2 - v1
-            v = v / np.linalg.norm(v, axis=1)[:, np.newaxis]
+    def append(self, features):
+        self._data[self._head] = features
+        self._data[self._head + self.length] = features
+        self._head = (self._head + 1) % self.length
+        self._count = min(self._count + 1, self.length)
 
-            angle = np.arccos(np.einsum('nt,nt->n',
-                                        v[[0, 1, 2, 4, 5, 6, 8, 9, 10, 12, 13, 14, 16, 17, 18], :],
-                                        v[[1, 2, 3, 5, 6, 7, 9, 10, 11, 13, 14, 15, 17, 18, 19], :]))
-            angle = np.degrees(angle)
+    def is_full(self):
+        return self._count >= self.length
 
-            d = np.concatenate([joint.flatten(), angle])
-            seq.append(d)
+    def window(self):
+        """가장 오래된 것부터 최신 순서의 (length, num_features) 뷰"""
+        return self._data[self._head:self._head + self.length]
 
-            if len(seq) < seq_length:
+
+sequence_buffer = GestureSequenceBuffer(seq_length, NUM_FEATURES)
+
+
+def detect_hand_landmarks(img, frame_seq=None):
+    """
+    프레임의 손 랜드마크를 MediaPipe로 추론하고 최근 결과로 저장합니다. (인식 루프에서만 호출)
+    """
+    global latest_landmarks
+    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    multi_hand_landmarks = hands.process(img_rgb).multi_hand_landmarks
+
+    if frame_seq is not None:
+        with landmark_lock:
+            latest_landmarks = (frame_seq, multi_hand_landmarks)
+    return multi_hand_landmarks
+
+def get_latest_landmarks(frame_seq=None):
+    """인식 루프의 가장 최근 랜드마크. frame_seq보다 LANDMARK_MAX_AGE 이상 오래됐으면 None."""
+    with landmark_lock:
+        seq, multi_hand_landmarks = latest_landmarks
+    if frame_seq is not None and frame_seq - seq >= LANDMARK_MAX_AGE:
+        return None
+    return multi_hand_landmarks
+
+def recognize_and_store_gesture(img, frame_seq=None):
+    global this_action, hand_landmarks
+    multi_hand_landmarks = detect_hand_landmarks(img, frame_seq)
+
+    if multi_hand_landmarks is not None:
+        for hand_landmarks in multi_hand_landmarks:
+            joint = np.array([[lm.x, lm.y, lm.z, lm.visibility] for lm in hand_landmarks.landmark])
+            sequence_buffer.append(extract_features(joint))
+
+            if not sequence_buffer.is_full():
                 continue
 
-            input_data = np.expand_dims(np.array(seq[-seq_length:], dtype=np.float32), axis=0)
-            y_pred = model.predict(input_data).squeeze()
+            # 최근 30프레임이 연속된 뷰로 바로 입력되므로 복사가 없음
+            input_data = sequence_buffer.window()[np.newaxis]
+            y_pred = fast_model.predict(input_data)[0]
 
             i_pred = int(np.argmax(y_pred))
             conf = y_pred[i_pred]
@@ -118,11 +185,11 @@ def recognize_and_store_gesture(img):
             action = actions[i_pred]
             action_seq.append(action)
 
-            if len(action_seq) < 5:  # 기준 5번 연속
+            if len(action_seq) < action_seq.maxlen:  # 기준 5번 연속
                 continue
 
             this_action = '?'
-            if action_seq[-1] == action_seq[-2] == action_seq[-3] == action_seq[-4] == action_seq[-5]:
+            if action_seq.count(action) == action_seq.maxlen:
                 this_action = action
 
     return this_action, hand_landmarks
@@ -134,21 +201,22 @@ def update_hand_gesture(action, landmarks):
 
 async def recognize_hand_gesture_periodically():
     global hand_gesture_action, hand_gesture_landmarks
+    last_seq = 0
     while True:
-        if len(video_frames) > 0 and hands is not None:
-            frame = video_frames[-1]
-            action, landmarks = recognize_and_store_gesture(frame)
+        last_seq, frame = await frame_buffer.wait_newer(last_seq)
+        if hands is not None:
+            action, landmarks = recognize_and_store_gesture(frame, last_seq)
             update_hand_gesture(action, landmarks)
-        await asyncio.sleep(0.1)  # 0.1초마다 실행
+        await asyncio.sleep(0.1)  # 최대 0.1초마다 실행
 
-def draw_hand_gesture(image):
+def draw_hand_gesture(image, frame_seq=None):
     global hand_gesture_action, hand_gesture_landmarks
-    
-    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    results = hands.process(image_rgb)
-    
-    if results.multi_hand_landmarks:
-        for hand_landmarks in results.multi_hand_landmarks:
+
+    # MediaPipe를 다시 돌리지 않고 인식 루프의 최근 결과를 그대로 그림
+    multi_hand_landmarks = get_latest_landmarks(frame_seq)
+
+    if multi_hand_landmarks:
+        for hand_landmarks in multi_hand_landmarks:
             mp_drawing.draw_landmarks(
                 image,
                 hand_landmarks,
@@ -157,7 +225,7 @@ def draw_hand_gesture(image):
                 mp_drawing.DrawingSpec(color=(0, 0, 255), thickness=2)
             )
         
-        hand_gesture_landmarks = results.multi_hand_landmarks[0]
+        hand_gesture_landmarks = multi_hand_landmarks[0]
     else:
         hand_gesture_landmarks = None
         hand_gesture_action = '?'
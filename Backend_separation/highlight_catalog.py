@@ -0,0 +1,173 @@
+# highlight_catalog.py
+# S3에 올라간 하이라이트 영상의 로컬 목록
+#
+# 업로드가 끝날 때마다 항목을 추가하고, 주기적으로 S3 전체 목록(페이지 단위)과 맞춰봅니다.
+# /s3_video_list 는 S3를 조회하지 않고 이 목록에서 사람/감정/날짜 조건과 커서로 한 페이지만 잘라 줍니다.
+
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+
+logger = logging.getLogger(__name__)
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'highlights', 'catalog.json')
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def parse_video_key(key):
+    """'{person}_{emotion}_{YYYYMMDD}_{HHMMSS}.mp4' 형식의 키에서 메타데이터를 읽습니다. 형식이 다르면 None."""
+    parts = key.split('_')
+    if len(parts) < 4:
+        return None
+    return {
+        "file_name": key,
+        "person_name": parts[0],
+        "emotion": parts[1],
+        "date_time": os.path.splitext('_'.join(parts[2:4]))[0],
+        "thumbnail_key": f"thumbnail_{os.path.splitext(key)[0]}.jpg",
+    }
+
+
+def sort_key(entry):
+    # 날짜/시간 문자열이 앞에 오므로 문자열 정렬이 곧 시간순 정렬
+    return f"{entry['date_time']}|{entry['file_name']}"
+
+
+class HighlightCatalog:
+    def __init__(self, path=CATALOG_PATH):
+        self.path = path
+        self._entries = {}  # file_name -> entry
+        # 인덱스: ('all',) / ('person', 이름) / ('emotion', 감정) -> 정렬된 sort_key 목록
+        self._indexes = {}
+        self._by_sort_key = {}
+        self._added_at = {}  # file_name -> 추가된 시각 (reconcile 경합 방지용)
+        self._lock = threading.Lock()
+        self.last_reconciled = None
+        self._load()
+
+    # ---------------------------------------------------------------- 저장
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"하이라이트 목록을 읽을 수 없어 다음 동기화 때 다시 만듭니다: {e}")
+            return
+        for entry in data.get("videos", []):
+            self._insert(entry)
+        self.last_reconciled = data.get("last_reconciled")
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {"last_reconciled": self.last_reconciled, "videos": list(self._entries.values())}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    # ---------------------------------------------------------------- 인덱스
+    def _index_keys(self, entry):
+        return [('all',), ('person', entry["person_name"]), ('emotion', entry["emotion"])]
+
+    def _insert(self, entry):
+        key = sort_key(entry)
+        self._entries[entry["file_name"]] = entry
+        self._by_sort_key[key] = entry
+        for index_key in self._index_keys(entry):
+            insort(self._indexes.setdefault(index_key, []), key)
+
+    def _delete(self, file_name):
+        entry = self._entries.pop(file_name)
+        key = sort_key(entry)
+        del self._by_sort_key[key]
+        self._added_at.pop(file_name, None)
+        for index_key in self._index_keys(entry):
+            keys = self._indexes[index_key]
+            keys.pop(bisect_left(keys, key))
+            if not keys:
+                del self._indexes[index_key]
+
+    # ---------------------------------------------------------------- 갱신
+    def add(self, video_key, size=None):
+        """업로드가 끝난 영상을 목록에 추가합니다. (업로드 큐 워커에서 호출)"""
+        entry = parse_video_key(video_key)
+        if entry is None:
+            return
+        entry["size"] = size
+        with self._lock:
+            if video_key in self._entries:
+                self._delete(video_key)
+            self._insert(entry)
+            self._added_at[video_key] = time.time()
+            self._save()
+
+    def reconcile(self, objects, started_at):
+        """
+        S3 전체 목록 {key: size}와 맞춥니다. 목록 조회를 시작한 뒤(started_at)
+        업로드되어 목록에 빠졌을 수 있는 항목은 지우지 않습니다.
+        """
+        with self._lock:
+            added = removed = 0
+            for key, size in objects.items():
+                if key not in self._entries:
+                    entry = parse_video_key(key)
+                    if entry is not None:
+                        entry["size"] = size
+                        self._insert(entry)
+                        added += 1
+            for key in [key for key in self._entries if key not in objects]:
+                if self._added_at.get(key, 0) < started_at:
+                    self._delete(key)
+                    removed += 1
+            self.last_reconciled = time.time()
+            self._save()
+        logger.info(f"하이라이트 목록 동기화: 추가 {added}, 삭제 {removed}, 전체 {len(self._entries)}")
+
+    # ---------------------------------------------------------------- 조회
+    def page(self, person=None, emotion=None, date=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """
+        최신순으로 한 페이지를 반환합니다.
+        - date: 'YYYYMMDD' (해당 날짜만)
+        - cursor: 이전 페이지의 next_cursor (그보다 오래된 항목부터)
+        반환값: (entries, next_cursor)
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        with self._lock:
+            # 조건이 하나라도 있으면 그 인덱스만 훑음
+            if person is not None:
+                keys = self._indexes.get(('person', person), [])
+            elif emotion is not None:
+                keys = self._indexes.get(('emotion', emotion), [])
+            else:
+                keys = self._indexes.get(('all',), [])
+
+            end = len(keys)
+            if date is not None:
+                end = bisect_left(keys, f"{date}_\uffff")  # 해당 날짜의 마지막 키보다 큰 값
+            if cursor is not None:
+                end = min(end, bisect_left(keys, cursor))
+            start = bisect_left(keys, date) if date is not None else 0
+
+            entries = []
+            i = end
+            while i > start and len(entries) < limit:
+                i -= 1
+                entry = self._by_sort_key[keys[i]]
+                if emotion is not None and entry["emotion"] != emotion:
+                    continue
+                entries.append(dict(entry))
+            # 다음 페이지가 있을 때만 커서 반환 (마지막으로 본 위치)
+            next_cursor = keys[i] if i > start and entries else None
+        return entries, next_cursor
+
+    def __len__(self):
+        return len(self._entries)
+
+
+highlight_catalog = HighlightCatalog()
@@ -0,0 +1,224 @@
+# highlight_recorder.py
+# 최근 몇 초의 JPEG 프레임을 계속 보관하다가, 감정이 감지되면
+# 감지 이전(pre-roll)과 이후(post-roll) 구간을 MP4 파일로 저장합니다.
+#
+# 로봇이 보낸 JPEG를 디코딩/재인코딩하지 않고 그대로 MP4 컨테이너('jpeg' 샘플, Motion JPEG)에 담으며,
+# 프레임마다 실제 수신 간격을 재생 시간으로 기록합니다. 파일 쓰기는 백그라운드 스레드에서 처리합니다.
+
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+PRE_ROLL = 5.0  # 감지 전 보관 구간 (초)
+POST_ROLL = 15.0  # 감지 후 기록 구간 (초)
+MAX_BUFFER_FRAMES = 600  # 타임스탬프가 이상해도 버퍼가 무한히 커지지 않도록 하는 상한
+RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recordings')
+
+
+def jpeg_size(data):
+    """JPEG 바이트의 SOF 마커에서 (width, height)를 읽습니다. 디코딩하지 않습니다."""
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        length = struct.unpack('>H', data[i + 2:i + 4])[0]
+        # SOF0~SOF15 (DHT=C4, JPG=C8, DAC=CC 제외)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack('>HH', data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+    return None
+
+
+MP4_TIMESCALE = 1000  # 타임스탬프 단위 (ms)
+IDENTITY_MATRIX = struct.pack('>9i', 0x10000, 0, 0, 0, 0x10000, 0, 0, 0, 0x40000000)
+
+
+def _box(box_type, *payloads):
+    payload = b''.join(payloads)
+    return struct.pack('>I', 8 + len(payload)) + box_type + payload
+
+
+def _full_box(box_type, version, flags, *payloads):
+    return _box(box_type, struct.pack('>I', (version << 24) | flags), *payloads)
+
+
+def _run_lengths(values):
+    runs = []
+    for value in values:
+        if runs and runs[-1][1] == value:
+            runs[-1][0] += 1
+        else:
+            runs.append([1, value])
+    return runs
+
+
+def write_mjpeg_mp4(path, jpegs, durations, width, height):
+    """
+    JPEG 바이트 목록을 MP4 파일로 저장합니다. (재인코딩 없음)
+    durations: 프레임별 재생 시간 (ms)
+    """
+    duration = sum(durations)
+    ftyp = _box(b'ftyp', b'isom', struct.pack('>I', 0x200), b'isom', b'iso2', b'mp41')
+    mdat_header = struct.pack('>I', 8 + sum(len(jpeg) for jpeg in jpegs)) + b'mdat'
+    first_offset = len(ftyp) + len(mdat_header)  # 모든 프레임을 청크 하나로 mdat 안에 연속 저장
+
+    sample_entry = _box(
+        b'jpeg',
+        b'\0' * 6, struct.pack('>H', 1),  # reserved, data_reference_index
+        b'\0' * 16,  # pre_defined, reserved
+        struct.pack('>HHIII', width, height, 0x480000, 0x480000, 0),  # 72dpi
+        struct.pack('>H', 1),  # frame_count
+        bytes([len(b'Photo - JPEG')]) + b'Photo - JPEG'.ljust(31, b'\0'),
+        struct.pack('>Hh', 0x18, -1),
+    )
+    runs = _run_lengths(durations)
+    stbl = _box(
+        b'stbl',
+        _full_box(b'stsd', 0, 0, struct.pack('>I', 1), sample_entry),
+        _full_box(b'stts', 0, 0, struct.pack('>I', len(runs)),
+                  b''.join(struct.pack('>II', count, delta) for count, delta in runs)),
+        _full_box(b'stsc', 0, 0, struct.pack('>IIII', 1, 1, len(jpegs), 1)),
+        _full_box(b'stsz', 0, 0, struct.pack('>II', 0, len(jpegs)),
+                  b''.join(struct.pack('>I', len(jpeg)) for jpeg in jpegs)),
+        _full_box(b'stco', 0, 0, struct.pack('>II', 1, first_offset)),
+    )  # stss가 없으면 모든 프레임이 키프레임
+    minf = _box(
+        b'minf',
+        _full_box(b'vmhd', 0, 1, b'\0' * 8),
+        _box(b'dinf', _full_box(b'dref', 0, 0, struct.pack('>I', 1), _full_box(b'url ', 0, 1))),
+        stbl,
+    )
+    mdia = _box(
+        b'mdia',
+        _full_box(b'mdhd', 0, 0, struct.pack('>IIIIHH', 0, 0, MP4_TIMESCALE, duration, 0x55C4, 0)),  # 'und'
+        _full_box(b'hdlr', 0, 0, struct.pack('>I', 0), b'vide', b'\0' * 12, b'VideoHandler\0'),
+        minf,
+    )
+    tkhd = _full_box(b'tkhd', 0, 3, struct.pack('>IIIII', 0, 0, 1, 0, duration), b'\0' * 8,
+                     struct.pack('>hhhH', 0, 0, 0, 0), IDENTITY_MATRIX, struct.pack('>II', width << 16, height << 16))
+    mvhd = _full_box(b'mvhd', 0, 0, struct.pack('>IIIIIH', 0, 0, MP4_TIMESCALE, duration, 0x10000, 0x100),
+                     b'\0' * 10, IDENTITY_MATRIX, b'\0' * 24, struct.pack('>I', 2))
+    moov = _box(b'moov', mvhd, _box(b'trak', tkhd, mdia))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(ftyp)
+        file.write(mdat_header)
+        for jpeg in jpegs:
+            file.write(jpeg)
+        file.write(moov)
+    os.replace(tmp_path, path)
+
+
+class HighlightClip:
+    def __init__(self, person, emotion, frames, trigger_time, end_time, on_saved):
+        self.person = person
+        self.emotion = emotion
+        self.frames = frames  # [(timestamp, jpeg)], pre-roll부터 시작
+        self.trigger_time = trigger_time
+        self.end_time = end_time
+        self.trigger_jpeg = frames[-1][1] if frames else None  # 감지 시점의 프레임 (썸네일용)
+        self.on_saved = on_saved
+        self.path = None
+
+
+class HighlightRecorder:
+    def __init__(self, pre_roll=PRE_ROLL, post_roll=POST_ROLL, output_dir=RECORDINGS_DIR):
+        self.pre_roll = pre_roll
+        self.post_roll = post_roll
+        self.output_dir = output_dir
+        self._frames = deque(maxlen=MAX_BUFFER_FRAMES)  # (timestamp, jpeg)
+        self._active = None  # post-roll을 모으는 중인 클립
+        self._lock = threading.Lock()
+        self._pending = queue.Queue()  # 파일로 쓸 클립
+        self._worker = None
+        self.saved = 0
+
+    @property
+    def is_recording(self):
+        return self._active is not None
+
+    def push(self, jpeg, timestamp=None):
+        """수신한 JPEG 프레임을 버퍼에 추가합니다. (MQTT 수신 핸들러에서 호출)"""
+        timestamp = timestamp or time.monotonic()
+        with self._lock:
+            self._frames.append((timestamp, jpeg))
+            while self._frames and timestamp - self._frames[0][0] > self.pre_roll:
+                self._frames.popleft()
+            if self._active is not None:
+                self._active.frames.append((timestamp, jpeg))
+                if timestamp >= self._active.end_time:
+                    self._finish_locked()
+
+    def trigger(self, person, emotion, on_saved=None):
+        """하이라이트 저장을 시작합니다. 이미 기록 중이면 False를 반환합니다."""
+        now = time.monotonic()
+        with self._lock:
+            if self._active is not None or not self._frames:
+                return False
+            self._active = HighlightClip(person, emotion, list(self._frames), now, now + self.post_roll, on_saved)
+        self._ensure_worker()
+        logger.info(f"하이라이트 기록 시작: {person} ({emotion}), pre-roll {len(self._active.frames)}프레임")
+        return True
+
+    def _finish_locked(self):
+        self._pending.put(self._active)
+        self._active = None
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._write_loop, name="highlight-writer", daemon=True)
+            self._worker.start()
+
+    def _write_loop(self):
+        while True:
+            try:
+                clip = self._pending.get(timeout=1.0)
+            except queue.Empty:
+                # 영상 수신이 끊겨 push가 더 이상 오지 않아도 post-roll 시간이 지나면 저장
+                with self._lock:
+                    if self._active is not None and time.monotonic() >= self._active.end_time + 1.0:
+                        self._finish_locked()
+                continue
+            try:
+                self._save(clip)
+            except Exception:
+                logger.exception("하이라이트 영상 저장 중 오류 발생")
+
+    def _save(self, clip):
+        size = jpeg_size(clip.frames[-1][1])
+        if size is None:
+            logger.warning("JPEG 크기를 읽을 수 없어 하이라이트를 저장하지 않습니다.")
+            return
+        # 해상도가 중간에 바뀐 프레임은 같은 스트림에 넣을 수 없으므로 제외
+        frames = [(timestamp, jpeg) for timestamp, jpeg in clip.frames if jpeg_size(jpeg) == size]
+        # 실제 수신 간격을 프레임별 재생 시간으로 사용해서 재생 길이가 실제 시간과 같도록 함 (프레임 중복 없음)
+        durations = [max(1, int(round((later[0] - earlier[0]) * MP4_TIMESCALE)))
+                     for earlier, later in zip(frames, frames[1:])]
+        durations.append(int(round(sum(durations) / len(durations))) if durations else MP4_TIMESCALE)
+        fps = len(frames) / (sum(durations) / MP4_TIMESCALE)
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        file_name = f'{clip.person}_{clip.emotion}_{time.strftime("%Y%m%d_%H%M%S")}.mp4'
+        clip.path = os.path.join(self.output_dir, file_name)
+        write_mjpeg_mp4(clip.path, [jpeg for _, jpeg in frames], durations, *size)
+        self.saved += 1
+        logger.info(f"하이라이트 저장 완료: {clip.path} ({len(frames)}프레임, {fps:.1f}fps)")
+
+        if clip.on_saved is not None:
+            clip.on_saved(clip)
+
+
+highlight_recorder = HighlightRecorder()
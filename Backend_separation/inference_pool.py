@@ -0,0 +1,121 @@
+# inference_pool.py
+# 무거운 추론(얼굴 검출/인식/감정 분석)을 이벤트 루프 밖의 워커 스레드에서 실행하는 풀
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+TIMING_WINDOW = 50  # 단계별로 최근 몇 번의 소요 시간을 보관할지
+
+
+class DroppedError(Exception):
+    """큐가 가득 차서 더 최신 프레임에 자리를 내준 요청"""
+
+
+class InferencePool:
+    """
+    프레임을 큐로 받아 워커 스레드에서 handler(frame)를 실행하고,
+    결과를 제출한 쪽의 이벤트 루프로 돌려줍니다.
+    """
+
+    def __init__(self, handler, max_workers=1, max_queue=4, name="inference"):
+        self._handler = handler
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._max_workers = max_workers
+        self._name = name
+        self._threads = []
+        self._timings = {}
+        self._timings_lock = threading.Lock()
+        self.dropped = 0
+
+    def start(self):
+        if self._threads:
+            return
+        for i in range(self._max_workers):
+            thread = threading.Thread(target=self._worker, name=f"{self._name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"추론 워커 {self._max_workers}개 시작")
+
+    def submit(self, frame):
+        """
+        프레임을 큐에 넣고 결과를 기다릴 수 있는 Future를 반환합니다.
+        큐가 가득 차면 가장 오래된 요청을 버리고 최신 프레임을 우선합니다.
+        버려진 요청의 Future에는 DroppedError가 설정됩니다. (취소하지 않으므로 기다리던 태스크가 죽지 않음)
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        while True:
+            try:
+                self._queue.put_nowait((frame, future, loop))
+                return future
+            except queue.Full:
+                try:
+                    _, old_future, old_loop = self._queue.get_nowait()
+                except queue.Empty:
+                    continue
+                self.dropped += 1
+                old_loop.call_soon_threadsafe(_set_exception, old_future, DroppedError())
+
+    @contextmanager
+    def stage(self, name):
+        """with pool.stage('detect'): ... 형태로 단계별 소요 시간을 기록합니다."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        with self._timings_lock:
+            if name not in self._timings:
+                self._timings[name] = deque(maxlen=TIMING_WINDOW)
+            self._timings[name].append(seconds)
+
+    def stats(self):
+        with self._timings_lock:
+            stages = {
+                name: {
+                    "count": len(samples),
+                    "last_ms": round(samples[-1] * 1000, 2),
+                    "avg_ms": round(sum(samples) / len(samples) * 1000, 2),
+                    "max_ms": round(max(samples) * 1000, 2),
+                }
+                for name, samples in self._timings.items() if samples
+            }
+        return {
+            "workers": len(self._threads),
+            "queue_depth": self._queue.qsize(),
+            "dropped": self.dropped,
+            "stages": stages,
+        }
+
+    def _worker(self):
+        while True:
+            frame, future, loop = self._queue.get()
+            if future.done():
+                continue  # 기다리던 쪽이 취소했거나 이미 버려진 요청
+            try:
+                with self.stage("total"):
+                    result = self._handler(frame)
+                loop.call_soon_threadsafe(_set_result, future, result)
+            except Exception as e:
+                logger.exception("추론 워커에서 오류 발생")
+                loop.call_soon_threadsafe(_set_exception, future, e)
+
+
+def _set_result(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_exception(future, exc):
+    if not future.done():
+        future.set_exception(exc)
+
@@ -0,0 +1,356 @@
+# message_store.py
+# 가족 그룹 단위의 append-only 채팅 메시지 저장소 (JSON Lines)
+#
+# messages/{group_key}/{YYYYMMDD}_{n}.jsonl 형태로 저장하며,
+# 날짜가 바뀌거나 세그먼트가 MAX_SEGMENT_BYTES를 넘으면 새 파일로 넘어갑니다.
+# 쓰기는 백그라운드 스레드가 모아서 처리하고, 배치마다 한 번 fsync 합니다.
+#
+# 그룹 키는 가족 구성원이 바뀌면 달라질 수 있으므로(가장 작은 ID가 나가거나 새로 들어오는 경우),
+# 사용자마다 메시지를 받은 적이 있는 그룹 목록(user_groups.json)을 따로 보관하고
+# 조회할 때는 그 그룹들을 모두 합쳐서 읽습니다. 구성원이 바뀌어도 이전 대화가 사라지지 않습니다.
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'messages')
+MAX_SEGMENT_BYTES = 4 * 1024 * 1024
+MAX_BATCH = 256
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+USER_GROUPS_FILE = 'user_groups.json'
+LEGACY_MIGRATED_MARKER = '.legacy_migrated'
+
+
+def family_group_key(user_ids):
+    """가족 구성원 ID 목록 -> 그룹 키. 가족은 모두 서로 연결되어 있으므로 가장 작은 ID를 사용합니다."""
+    return str(min(int(user_id) for user_id in user_ids))
+
+
+class MessageStore:
+    def __init__(self, base_dir=BASE_DIR, max_segment_bytes=MAX_SEGMENT_BYTES):
+        self.base_dir = base_dir
+        self.max_segment_bytes = max_segment_bytes
+        self._queue = queue.Queue()
+        self._id_lock = threading.Lock()
+        self._last_id = 0
+        self._writer = None
+        self._open_segments = {}  # group_key -> (segment 경로, 파일 객체)
+        # group_key -> GroupIndex. 처음 조회될 때 세그먼트를 한 번 훑어서 만들고 이후 쓰기마다 갱신
+        self._indexes = {}
+        self._index_lock = threading.Lock()
+        self._user_groups = None  # user_id -> {group_key}. 처음 필요할 때 파일에서 읽거나 다시 만듦
+        self._groups_lock = threading.Lock()
+
+    # ---------------------------------------------------------------- 쓰기
+    def next_id(self):
+        """마이크로초 타임스탬프 기반의 단조 증가 메시지 ID"""
+        with self._id_lock:
+            self._last_id = max(time.time_ns() // 1000, self._last_id + 1)
+            return self._last_id
+
+    def append(self, group_key, sender_id, message, recipients):
+        """
+        메시지 한 건을 큐에 넣고 바로 반환합니다. (이벤트 루프를 막지 않음)
+        recipients는 이 메시지를 볼 수 있는 사용자 ID 목록입니다.
+        """
+        entry = {
+            "id": self.next_id(),
+            "sender_id": sender_id,
+            "message": message,
+            "recipients": sorted(recipients),
+            "timestamp": datetime.now().isoformat(timespec='seconds'),
+        }
+        self._ensure_writer()
+        self._queue.put((str(group_key), entry))
+        return entry
+
+    def _ensure_writer(self):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="message-store-writer", daemon=True)
+            self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+            except Exception:
+                logger.exception("메시지 저장 중 오류 발생")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        """큐에 쌓인 메시지가 모두 디스크에 기록될 때까지 기다립니다. (스크립트/종료 시 사용)"""
+        self._queue.join()
+
+    def _write_batch(self, batch):
+        touched = {}
+        written = []
+        for group_key, entry in batch:
+            path, file = self._segment_for(group_key)
+            offset = file.tell()
+            file.write(json.dumps(entry, ensure_ascii=False).encode('utf-8') + b"\n")
+            touched[id(file)] = file
+            written.append((group_key, entry, os.path.basename(path), offset))
+        # 배치 단위로 한 번만 fsync
+        for file in touched.values():
+            file.flush()
+            os.fsync(file.fileno())
+        # 디스크에 기록된 뒤에 인덱스에 반영해야 조회 시 항상 읽을 수 있음
+        with self._index_lock:
+            for group_key, entry, segment, offset in written:
+                index = self._indexes.get(group_key)
+                if index is not None:
+                    index.add(entry["id"], segment, offset, entry["recipients"])
+        self._add_user_groups((group_key, entry["recipients"]) for group_key, entry, _, _ in written)
+
+    def _segment_for(self, group_key):
+        group_dir = os.path.join(self.base_dir, group_key)
+        today = datetime.now().strftime('%Y%m%d')
+        current = self._open_segments.get(group_key)
+        if current is not None:
+            path, file = current
+            if os.path.basename(path).startswith(today) and file.tell() < self.max_segment_bytes:
+                return current
+            file.close()
+
+        os.makedirs(group_dir, exist_ok=True)
+        index = 0
+        existing = [name for name in self.list_segments(group_key) if name.startswith(today)]
+        if existing:
+            index = int(existing[-1].split('_')[1].split('.')[0])
+            if os.path.getsize(os.path.join(group_dir, existing[-1])) >= self.max_segment_bytes:
+                index += 1
+        path = os.path.join(group_dir, f"{today}_{index:04d}.jsonl")
+        file = open(path, 'ab')
+        self._open_segments[group_key] = (path, file)
+        return path, file
+
+    # ---------------------------------------------------------------- 읽기
+    def list_segments(self, group_key):
+        """오래된 것부터 정렬된 세그먼트 파일 이름 목록"""
+        group_dir = os.path.join(self.base_dir, str(group_key))
+        if not os.path.isdir(group_dir):
+            return []
+        return sorted(name for name in os.listdir(group_dir) if name.endswith('.jsonl'))
+
+    def _load_index(self, group_key):
+        group_key = str(group_key)
+        with self._index_lock:
+            index = self._indexes.get(group_key)
+            if index is not None:
+                return index
+
+            index = GroupIndex()
+            group_dir = os.path.join(self.base_dir, group_key)
+            for name in self.list_segments(group_key):
+                with open(os.path.join(group_dir, name), 'rb') as file:
+                    offset = 0
+                    for line in file:
+                        try:
+                            entry = json.loads(line)
+                            index.add(entry["id"], name, offset, entry.get("recipients", ()))
+                        except (json.JSONDecodeError, KeyError):
+                            pass  # 쓰다 만 마지막 줄은 건너뜀
+                        offset += len(line)
+            self._indexes[group_key] = index
+            logger.info(f"메시지 인덱스 생성: group={group_key}, {len(index.ids)}건")
+            return index
+
+    def _read_entries(self, group_key, positions):
+        group_dir = os.path.join(self.base_dir, str(group_key))
+        entries = []
+        files = {}
+        try:
+            for segment, offset in positions:
+                if segment not in files:
+                    files[segment] = open(os.path.join(group_dir, segment), 'rb')
+                file = files[segment]
+                file.seek(offset)
+                entries.append(json.loads(file.readline()))
+        finally:
+            for file in files.values():
+                file.close()
+        return entries
+
+    # ---------------------------------------------------------------- 사용자별 그룹 목록
+    def _user_groups_path(self):
+        return os.path.join(self.base_dir, USER_GROUPS_FILE)
+
+    def _ensure_user_groups(self):
+        """_groups_lock을 잡은 상태에서 호출합니다."""
+        if self._user_groups is not None:
+            return
+        path = self._user_groups_path()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                self._user_groups = {int(user_id): set(groups) for user_id, groups in json.load(file).items()}
+            return
+
+        # 목록 파일이 없으면 기존 그룹 로그의 수신자로 다시 만듦
+        self._user_groups = {}
+        if os.path.isdir(self.base_dir):
+            for group_key in sorted(os.listdir(self.base_dir)):
+                if not os.path.isdir(os.path.join(self.base_dir, group_key)):
+                    continue
+                index = self._load_index(group_key)
+                with self._index_lock:
+                    recipients = set().union(*index.recipients) if index.recipients else set()
+                for user_id in recipients:
+                    self._user_groups.setdefault(int(user_id), set()).add(group_key)
+        if self._user_groups:
+            self._save_user_groups()
+            logger.info(f"사용자별 메시지 그룹 목록 생성: {len(self._user_groups)}명")
+
+    def _save_user_groups(self):
+        os.makedirs(self.base_dir, exist_ok=True)
+        path = self._user_groups_path()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({str(user_id): sorted(groups) for user_id, groups in self._user_groups.items()}, file)
+        os.replace(tmp_path, path)
+
+    def _add_user_groups(self, items):
+        with self._groups_lock:
+            self._ensure_user_groups()
+            changed = False
+            for group_key, recipients in items:
+                for user_id in recipients:
+                    groups = self._user_groups.setdefault(int(user_id), set())
+                    if group_key not in groups:
+                        groups.add(group_key)
+                        changed = True
+            if changed:
+                self._save_user_groups()
+
+    def groups_for(self, user_id):
+        """사용자가 메시지를 받은 적이 있는 모든 그룹 키"""
+        with self._groups_lock:
+            self._ensure_user_groups()
+            return set(self._user_groups.get(int(user_id), ()))
+
+    # ---------------------------------------------------------------- 조회
+    def _select(self, group_key, user_id, before, after, limit):
+        """그룹 하나에서 커서 방향으로 최대 limit + 1개의 (id, 그룹, 세그먼트, 오프셋)을 고릅니다."""
+        index = self._load_index(group_key)
+        with self._index_lock:
+            selected = []
+            if after is not None:
+                i = bisect_right(index.ids, after)
+                while i < len(index.ids) and len(selected) <= limit:
+                    if user_id in index.recipients[i]:
+                        selected.append(i)
+                    i += 1
+            else:
+                i = bisect_left(index.ids, before) if before is not None else len(index.ids)
+                while i > 0 and len(selected) <= limit:
+                    i -= 1
+                    if user_id in index.recipients[i]:
+                        selected.append(i)
+            return [(index.ids[i], group_key, index.segments[i], index.offsets[i]) for i in selected]
+
+    def page(self, group_key, user_id, before=None, after=None, limit=DEFAULT_PAGE_SIZE):
+        """
+        사용자가 받을 수 있는 메시지를 커서 기준으로 한 페이지만 읽습니다. (결과는 오래된 순)
+        현재 그룹과 사용자가 이전에 속했던 그룹을 모두 합쳐서 봅니다.
+        - before: 이 ID보다 오래된 메시지 중 가장 최근 limit개 (커서가 없으면 마지막 페이지)
+        - after: 이 ID보다 새로운 메시지 중 가장 오래된 limit개
+        반환값: (messages, has_more)
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        groups = self.groups_for(user_id)
+        if group_key is not None:
+            groups.add(str(group_key))
+
+        candidates = []
+        for group in sorted(groups):
+            candidates.extend(self._select(group, user_id, before, after, limit))
+        # 메시지 ID는 저장소 전체에서 단조 증가하므로 그룹을 섞어도 ID 순서가 시간 순서
+        candidates.sort(reverse=after is None)
+        has_more = len(candidates) > limit
+        selected = sorted(candidates[:limit])
+
+        by_group = {}
+        for message_id, group, segment, offset in selected:
+            by_group.setdefault(group, []).append((segment, offset))
+        entries = {}
+        for group, positions in by_group.items():
+            for entry in self._read_entries(group, positions):
+                entries[entry["id"]] = entry
+        return [entries[message_id] for message_id, _, _, _ in selected if message_id in entries], has_more
+
+
+class GroupIndex:
+    """그룹 로그의 메시지 ID -> (세그먼트, 바이트 오프셋) 인덱스. ID 오름차순으로 쌓입니다."""
+
+    def __init__(self):
+        self.ids = []
+        self.segments = []
+        self.offsets = []
+        self.recipients = []
+
+    def add(self, message_id, segment, offset, recipients):
+        if self.ids and message_id <= self.ids[-1]:
+            return  # 인덱스를 만드는 도중 이미 읽힌 메시지
+        self.ids.append(message_id)
+        self.segments.append(segment)
+        self.offsets.append(offset)
+        self.recipients.append(frozenset(recipients))
+
+
+message_store = MessageStore()
+
+
+def migrate_legacy_logs(directory=os.path.dirname(os.path.abspath(__file__)), store=message_store):
+    """
+    기존 {user_id}_messages.json 파일을 저장소로 옮깁니다. 한 번 옮긴 뒤에는 표시 파일을 남겨 건너뜁니다.
+    예전 파일은 받는 사람마다 따로 복사본을 가지고 있었으므로, 각 메시지는 그 사용자에게만 보이도록
+    사용자 자신의 그룹에 옮깁니다. (사용자별 그룹 목록을 통해 가족 그룹 메시지와 함께 조회됨)
+    """
+    marker = os.path.join(store.base_dir, LEGACY_MIGRATED_MARKER)
+    if os.path.exists(marker):
+        return 0
+
+    migrated = 0
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('_messages.json'):
+            continue
+        try:
+            user_id = int(name.split('_')[0])
+        except ValueError:
+            continue
+        with open(os.path.join(directory, name), 'r', encoding='utf-8') as file:
+            try:
+                messages = json.load(file)
+            except json.JSONDecodeError:
+                messages = []
+        group_key = family_group_key([user_id])
+        for message in messages:
+            store.append(group_key, message.get("sender_id"), message.get("message"), [user_id])
+        migrated += len(messages)
+        logger.info(f"{name}: {len(messages)}개 메시지 이전")
+
+    store.flush()
+    os.makedirs(store.base_dir, exist_ok=True)
+    with open(marker, 'w', encoding='utf-8') as file:
+        file.write(datetime.now().isoformat(timespec='seconds'))
+    return migrated
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    migrate_legacy_logs()
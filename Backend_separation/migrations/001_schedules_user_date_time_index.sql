@@ -0,0 +1,7 @@
+-- 001_schedules_user_date_time_index.sql
+-- /calendar 의 가족 일정 조회(schedules.user_name 조인 + date, time 정렬)와
+-- GPT 일정 헬퍼의 user_name/date/time 조회·삭제를 위한 복합 인덱스
+--
+-- 적용: mysql -h $DB_HOST -u $DB_USER -p $DB_NAME < migrations/001_schedules_user_date_time_index.sql
+
+CREATE INDEX idx_schedules_user_date_time ON schedules (user_name, date, time);
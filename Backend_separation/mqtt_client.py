@@ -1,21 +1,22 @@
 # mqtt_client.py
 # MQTT 설정 및 메시지 처리를 위한 파일
 
-import numpy as np
 import json
 import logging
-import cv2
 from gmqtt import Client as MQTTClient
+from frame_buffer import FrameRingBuffer
+from highlight_recorder import highlight_recorder
 
 # Logging 설정
 logger = logging.getLogger(__name__)
 
 # 상태 변수
 distance_data = None
-video_frames = []
 audio_data = []
 speech_text = None
-MAX_FRAMES = 3
+MAX_FRAMES = 8  # 20fps 기준 약 0.4초 분량 (뷰가 덮어써지기 전까지의 여유)
+frame_buffer = FrameRingBuffer(MAX_FRAMES)  # 로봇 카메라
+home_frame_buffer = FrameRingBuffer(MAX_FRAMES)  # 스마트홈 고정 카메라
 current_speed = 50
 
 # MQTT 설정
@@ -25,9 +26,13 @@ MQTT_PORT = 1883
 MQTT_TOPIC_COMMAND = "robot/commands"
 MQTT_TOPIC_DISTANCE = "robot/distance"
 MQTT_TOPIC_VIDEO = "robot/video"
+MQTT_TOPIC_HOME_VIDEO = "home/video"
 MQTT_TOPIC_SPEECH = "robot/speech"
 MQTT_TOPIC_TEXT = "robot/text"
 
+# 영상 소스 이름 -> 프레임 버퍼 (얼굴 인식은 모든 소스를 한 배치로 처리)
+frame_buffers = {"robot": frame_buffer, "home": home_frame_buffer}
+
 client = MQTTClient(client_id="fastapi_client")
 
 
@@ -36,19 +41,22 @@ async def on_connect():
     logger.info("연결: MQTT Broker")
     client.subscribe(MQTT_TOPIC_DISTANCE)
     client.subscribe(MQTT_TOPIC_VIDEO)
+    client.subscribe(MQTT_TOPIC_HOME_VIDEO)
     client.subscribe(MQTT_TOPIC_SPEECH)  # 음성 텍스트 토픽 구독
     logger.info("구독 완료")
 
 
 async def on_message(client, topic, payload, qos, properties):
-    global audio_data, distance_data, video_frames, speech_text
+    global audio_data, distance_data, speech_text
 
     # 비디오 데이터 처리
     if topic == MQTT_TOPIC_VIDEO:
-        if len(video_frames) >= MAX_FRAMES:
-            video_frames.pop(0)  # 가장 오래된 프레임 삭제
-        img_encode = cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_COLOR)
-        video_frames.append(img_encode)
+        # 압축된 상태로만 저장하고, 디코딩은 픽셀이 필요한 소비자가 처음 읽을 때 한 번만 수행
+        frame_buffer.put_jpeg(payload)  # 링 버퍼가 가장 오래된 슬롯을 덮어씀
+        highlight_recorder.push(payload)  # 하이라이트 pre-roll용으로 몇 초 분량의 JPEG를 보관
+        return
+    if topic == MQTT_TOPIC_HOME_VIDEO:
+        home_frame_buffer.put_jpeg(payload)
         return
 
 
@@ -1,102 +1,301 @@
 import boto3
+import heapq
+import itertools
+import json
 import logging
 import os
+import random
+import threading
+import time
+import uuid
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
 from dotenv import load_dotenv
-import cv2
+from highlight_catalog import highlight_catalog, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 # .env 파일 로드
 load_dotenv()
 
-# S3 클라이언트 설정
+# S3 클라이언트 설정 (S3_ENDPOINT_URL을 지정하면 moto 서버 같은 로컬 S3로 연결)
 s3_client = boto3.client(
     's3',
     aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
     aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-    region_name=os.getenv('AWS_REGION')
+    region_name=os.getenv('AWS_REGION'),
+    endpoint_url=os.getenv('S3_ENDPOINT_URL')
 )
 
 # S3 버킷 이름 설정
 BUCKET_NAME = os.getenv('S3_BUCKET_NAME')
 
-async def upload_to_s3(file_name):
+UPLOAD_JOURNAL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+UPLOAD_WORKERS = 2
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 2.0  # 초. 실패할 때마다 두 배씩 (최대 BACKOFF_MAX)
+BACKOFF_MAX = 300.0
+PRESIGNED_URL_EXPIRES = 3600  # URL 유효 시간 1시간
+PRESIGNED_URL_MARGIN = 300  # 만료 5분 전부터는 새 URL 발급
+CATALOG_RECONCILE_INTERVAL = 600  # S3 전체 목록과 맞추는 주기 (초)
+
+# 8MB 이상이면 멀티파트로, 파트는 최대 4개까지 동시에 업로드
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=4,
+    use_threads=True,
+)
+
+
+class UploadQueue:
     """
-    지정된 파일을 S3 버킷에 업로드하고 썸네일을 생성합니다.
+    하이라이트 영상/썸네일 업로드 큐.
+    작업마다 journal 디렉토리에 JSON 파일을 남기고 업로드가 끝나면 지우므로,
+    서버가 재시작되어도 남아 있는 작업을 start()에서 다시 이어서 올립니다.
+    실패한 작업은 지수 백오프로 재시도하고, MAX_ATTEMPTS를 넘으면 failed/로 옮깁니다.
     """
-    try:
-        # 원본 비디오 업로드
-        s3_client.upload_file(file_name, BUCKET_NAME, file_name)
-        logging.info(f"파일 {file_name}이 S3 버킷 {BUCKET_NAME}에 성공적으로 업로드되었습니다.")
-        
-        # 썸네일 생성 및 업로드
-        thumbnail_name = f"thumbnail_{file_name.replace('.mp4', '.jpg')}"
-        create_thumbnail(file_name, thumbnail_name)
-        s3_client.upload_file(thumbnail_name, BUCKET_NAME, thumbnail_name)
-        logging.info(f"썸네일 {thumbnail_name}이 S3 버킷 {BUCKET_NAME}에 업로드되었습니다.")
-        
-        # 로컬 파일 삭제
-        os.remove(file_name)
-        os.remove(thumbnail_name)
-        logging.info(f"로컬 파일 {file_name}과 {thumbnail_name}이 삭제되었습니다.")
-    except ClientError as e:
-        logging.error(f"S3 업로드 중 오류 발생: {e}")
-    except Exception as e:
-        logging.error(f"예상치 못한 오류 발생: {e}")
+
+    def __init__(self, client, bucket, journal_dir=UPLOAD_JOURNAL_DIR, workers=UPLOAD_WORKERS,
+                 transfer_config=TRANSFER_CONFIG, on_uploaded=None):
+        self.client = client
+        self.on_uploaded = on_uploaded  # 업로드 완료 후 (video_key, size)로 호출
+        self.bucket = bucket
+        self.journal_dir = journal_dir
+        self.failed_dir = os.path.join(journal_dir, 'failed')
+        self.workers = workers
+        self.transfer_config = transfer_config
+        self._heap = []  # (실행 가능 시각, 순번, 작업)
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+        self.in_flight = 0
+        self.uploaded = 0
+        self.failed = 0
+        self.retries = 0
+
+    # ---------------------------------------------------------------- 작업 추가
+    def start(self):
+        """워커를 띄우고, journal에 남아 있는 미완료 작업을 다시 큐에 넣습니다."""
+        with self._cond:
+            if self._threads:
+                return
+            os.makedirs(self.journal_dir, exist_ok=True)
+            for name in sorted(os.listdir(self.journal_dir)):
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    with open(os.path.join(self.journal_dir, name), 'r', encoding='utf-8') as file:
+                        self._push(json.load(file), 0)
+                except (OSError, json.JSONDecodeError) as e:
+                    logging.error(f"업로드 journal {name}을 읽을 수 없습니다: {e}")
+            if self._heap:
+                logging.info(f"미완료 업로드 {len(self._heap)}건을 이어서 진행합니다.")
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work_loop, name=f"s3-upload-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def enqueue(self, video_path, thumbnail_jpeg=None):
+        """
+        영상 업로드를 예약하고 바로 반환합니다. (어느 스레드에서든 호출 가능)
+        thumbnail_jpeg가 있으면 그 JPEG 바이트를 썸네일로 사용합니다.
+        """
+        video_key = os.path.basename(video_path)
+        thumbnail_key = f"thumbnail_{os.path.splitext(video_key)[0]}.jpg"
+        thumbnail_path = os.path.join(os.path.dirname(video_path), thumbnail_key)
+        if thumbnail_jpeg is not None:
+            with open(thumbnail_path, 'wb') as file:
+                file.write(thumbnail_jpeg)
+        else:
+            create_thumbnail(video_path, thumbnail_path)
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "video_path": video_path,
+            "video_key": video_key,
+            "thumbnail_path": thumbnail_path,
+            "thumbnail_key": thumbnail_key,
+            "attempts": 0,
+            "created_at": time.time(),
+        }
+        self.start()  # journal을 다시 읽기 전에 워커를 띄워야 이 작업이 두 번 들어가지 않음
+        self._write_journal(job)
+        with self._cond:
+            self._push(job, 0)
+        return job
+
+    def _push(self, job, delay):
+        heapq.heappush(self._heap, (time.time() + delay, next(self._counter), job))
+        self._cond.notify()
+
+    # ---------------------------------------------------------------- journal
+    def _journal_path(self, job):
+        return os.path.join(self.journal_dir, f"{job['id']}.json")
+
+    def _write_journal(self, job):
+        os.makedirs(self.journal_dir, exist_ok=True)
+        path = self._journal_path(job)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as file:
+            json.dump(job, file, ensure_ascii=False)
+        os.replace(f"{path}.tmp", path)
+
+    # ---------------------------------------------------------------- 워커
+    def _next_job(self):
+        with self._cond:
+            while True:
+                if self._heap and self._heap[0][0] <= time.time():
+                    self.in_flight += 1
+                    return heapq.heappop(self._heap)[2]
+                timeout = self._heap[0][0] - time.time() if self._heap else None
+                self._cond.wait(timeout)
+
+    def _work_loop(self):
+        while True:
+            job = self._next_job()
+            try:
+                self._upload(job)
+            except Exception as e:
+                try:
+                    self._retry(job, e)
+                except Exception:
+                    logging.exception(f"업로드 재시도 예약 중 오류 발생: {job['video_key']}")
+            else:
+                with self._cond:
+                    self.uploaded += 1
+            finally:
+                with self._cond:
+                    self.in_flight -= 1
+
+    def _upload(self, job):
+        # 썸네일을 먼저 올려서 영상이 목록에 보일 때는 썸네일도 있도록 함
+        if os.path.exists(job["thumbnail_path"]):
+            self.client.upload_file(job["thumbnail_path"], self.bucket, job["thumbnail_key"],
+                                    ExtraArgs={"ContentType": "image/jpeg"}, Config=self.transfer_config)
+        self.client.upload_file(job["video_path"], self.bucket, job["video_key"],
+                                ExtraArgs={"ContentType": "video/mp4"},
+                                Config=self.transfer_config)
+        logging.info(f"파일 {job['video_key']}이 S3 버킷 {self.bucket}에 성공적으로 업로드되었습니다.")
+        if self.on_uploaded is not None:
+            try:
+                self.on_uploaded(job["video_key"], os.path.getsize(job["video_path"]))
+            except Exception:
+                # 목록 갱신 실패는 다음 동기화 때 복구되므로 업로드를 다시 하지 않음
+                logging.exception(f"업로드 완료 처리 중 오류 발생: {job['video_key']}")
+
+        # 로컬 파일과 journal 삭제
+        for path in (job["video_path"], job["thumbnail_path"], self._journal_path(job)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _retry(self, job, error):
+        job["attempts"] += 1
+        job["last_error"] = str(error)
+        if not os.path.exists(job["video_path"]) or job["attempts"] >= MAX_ATTEMPTS:
+            logging.error(f"S3 업로드 실패, 재시도를 중단합니다: {job['video_key']} ({error})")
+            os.makedirs(self.failed_dir, exist_ok=True)
+            # 마지막 시도 횟수와 오류를 기록한 뒤 failed/로 옮김
+            self._write_journal(job)
+            os.replace(self._journal_path(job), os.path.join(self.failed_dir, f"{job['id']}.json"))
+            with self._cond:
+                self.failed += 1
+            return
+
+        delay = min(BACKOFF_BASE * 2 ** (job["attempts"] - 1), BACKOFF_MAX) * random.uniform(0.8, 1.2)
+        level = logging.WARNING if isinstance(error, ClientError) else logging.ERROR
+        logging.log(level, f"S3 업로드 오류, {delay:.0f}초 후 재시도 ({job['attempts']}/{MAX_ATTEMPTS}): {error}")
+        self._write_journal(job)
+        with self._cond:
+            self.retries += 1
+            self._push(job, delay)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "workers": len(self._threads),
+                "queued": len(self._heap),
+                "in_flight": self.in_flight,
+                "uploaded": self.uploaded,
+                "failed": self.failed,
+                "retries": self.retries,
+            }
+
 
 def create_thumbnail(video_path, thumbnail_path):
-    """비디오에서 썸네일을 생성합니다."""
+    """비디오에서 썸네일을 생성합니다. (감지 프레임이 없을 때만 사용)"""
+    import cv2  # 썸네일 대체 경로에서만 필요하므로 업로드 큐만 쓸 때는 OpenCV 없이도 동작
+
     cap = cv2.VideoCapture(video_path)
     ret, frame = cap.read()
     if ret:
         cv2.imwrite(thumbnail_path, frame)
     cap.release()
 
-async def list_s3_videos():
+
+upload_queue = UploadQueue(s3_client, BUCKET_NAME, on_uploaded=highlight_catalog.add)
+
+def reconcile_catalog():
+    """S3 버킷 전체를 페이지 단위로 조회해서 하이라이트 목록과 맞춥니다. (1000개 이상도 누락 없음)"""
+    started_at = time.time()
+    objects = {}
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=BUCKET_NAME):
+        for obj in page.get('Contents', []):
+            key = obj['Key']
+            if key.endswith('.mp4') and not key.startswith('thumbnail_'):
+                objects[key] = obj.get('Size')
+    highlight_catalog.reconcile(objects, started_at)
+
+
+class PresignedUrlCache:
+    """영상/썸네일 presigned URL을 만료 직전까지 재사용합니다. (S3_ENDPOINT_URL도 클라이언트가 반영)"""
+
+    def __init__(self, client, bucket, expires_in=PRESIGNED_URL_EXPIRES, refresh_margin=PRESIGNED_URL_MARGIN):
+        self.client = client
+        self.bucket = bucket
+        self.expires_in = expires_in
+        self.refresh_margin = refresh_margin
+        self._urls = {}  # key -> (url, 만료 시각)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            cached = self._urls.get(key)
+            if cached is not None and cached[1] - self.refresh_margin > now:
+                return cached[0]
+        url = self.client.generate_presigned_url('get_object',
+                                                 Params={'Bucket': self.bucket, 'Key': key},
+                                                 ExpiresIn=self.expires_in)
+        with self._lock:
+            self._urls[key] = (url, now + self.expires_in)
+            # 만료된 URL 정리
+            if len(self._urls) > 4 * MAX_PAGE_SIZE:
+                self._urls = {k: v for k, v in self._urls.items() if v[1] > now}
+        return url
+
+
+presigned_urls = PresignedUrlCache(s3_client, BUCKET_NAME)
+
+
+def list_s3_videos(person=None, emotion=None, date=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
     """
-    S3 버킷에 저장된 영상 목록과 썸네일 URL을 반환합니다.
+    하이라이트 목록에서 조건에 맞는 영상 한 페이지와 썸네일/다운로드 URL을 반환합니다.
+    S3 목록 조회는 하지 않으며, URL은 만료 전까지 캐시된 것을 사용합니다.
     """
-    try:
-        response = s3_client.list_objects_v2(Bucket=BUCKET_NAME)
-        
-        if 'Contents' not in response:
-            return []
-
-        video_list = []
-        for obj in response['Contents']:
-            file_name = obj['Key']
-            if file_name.endswith('.mp4'):
-                # 파일 이름���서 정보 추출
-                parts = file_name.split('_')
-                if len(parts) >= 4:
-                    person_name = parts[0]
-                    emotion = parts[1]
-                    date_time = '_'.join(parts[2:4]).replace('.mp4', '')
-                    
-                    # 썸네일 URL 생성
-                    thumbnail_name = f"thumbnail_{file_name.replace('.mp4', '.jpg')}"
-                    thumbnail_url = f"https://{BUCKET_NAME}.s3.amazonaws.com/{thumbnail_name}"
-                    
-                    # 영상 다운로드 URL 생성
-                    video_url = s3_client.generate_presigned_url('get_object',
-                                                                 Params={'Bucket': BUCKET_NAME,
-                                                                         'Key': file_name},
-                                                                 ExpiresIn=3600)  # URL 유효 시간 1시간
-                    
-                    video_info = {
-                        'file_name': file_name,
-                        'person_name': person_name,
-                        'emotion': emotion,
-                        'date_time': date_time,
-                        'thumbnail_url': thumbnail_url,
-                        'video_url': video_url  # 영상 다운로드 URL 추가
-                    }
-                    video_list.append(video_info)
-
-        return video_list
-
-    except ClientError as e:
-        logging.error(f"S3 목록 조회 중 오류 발생: {e}")
-        return []
-    except Exception as e:
-        logging.error(f"예상치 못한 오류 발생: {e}")
-        return []
\ No newline at end of file
+    entries, next_cursor = highlight_catalog.page(person, emotion, date, cursor, limit)
+    video_list = []
+    for entry in entries:
+        try:
+            video_url = presigned_urls.get(entry['file_name'])
+            thumbnail_url = presigned_urls.get(entry['thumbnail_key'])
+        except ClientError as e:
+            logging.error(f"presigned URL 생성 중 오류 발생: {e}")
+            video_url = thumbnail_url = None
+        video_list.append({
+            'file_name': entry['file_name'],
+            'person_name': entry['person_name'],
+            'emotion': entry['emotion'],
+            'date_time': entry['date_time'],
+            'thumbnail_url': thumbnail_url,
+            'video_url': video_url  # 영상 다운로드 URL
+        })
+    return video_list, next_cursor
@@ -0,0 +1,6 @@
+# Backend_separation 모듈은 서로를 최상위 이름으로 import 하므로 (예: from db_pool import db_pool)
+# 테스트에서도 같은 방식으로 import 할 수 있게 상위 폴더를 경로에 추가합니다.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
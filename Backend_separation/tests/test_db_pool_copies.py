@@ -0,0 +1,14 @@
+# Backend_separation/db_pool.py와 GPT/db_pool.py는 따로 배포되는 같은 파일이므로 내용이 어긋나면 실패합니다
+import os
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_POOL = os.path.join(BACKEND_DIR, "db_pool.py")
+GPT_POOL = os.path.join(os.path.dirname(BACKEND_DIR), "GPT", "db_pool.py")
+
+
+def test_gpt_copy_matches_backend_pool():
+    with open(BACKEND_POOL, "rb") as file:
+        backend = file.read()
+    with open(GPT_POOL, "rb") as file:
+        gpt = file.read()
+    assert gpt == backend, "GPT/db_pool.py가 Backend_separation/db_pool.py와 다릅니다. 한쪽을 고쳤다면 그대로 복사하세요."
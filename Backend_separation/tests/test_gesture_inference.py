@@ -0,0 +1,58 @@
+# NumpyGestureModel이 Keras model.predict와 같은 결과를 내는지, 얼마나 빠른지 확인합니다.
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+tf = pytest.importorskip("tensorflow")
+from tensorflow.keras.layers import Input, LSTM, Dense  # noqa: E402
+from tensorflow.keras.models import Model  # noqa: E402
+
+from gesture_inference import NumpyGestureModel, check_parity_and_benchmark  # noqa: E402
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "model.keras")
+TOLERANCE = 1e-4
+
+
+def build_keras_model():
+    # hand_gesture_recognition.create_model()과 같은 구조 (MediaPipe/MQTT를 import하지 않도록 여기서 만듦)
+    tf.keras.utils.set_random_seed(0)
+    input_layer = Input(shape=(30, 99))
+    x = LSTM(64)(input_layer)
+    x = Dense(32, activation='relu')(x)
+    output = Dense(3, activation='softmax')(x)
+    model = Model(inputs=input_layer, outputs=output)
+    if os.path.exists(MODEL_PATH):
+        model.load_weights(MODEL_PATH)  # 학습된 가중치가 있으면 실제 가중치로 비교
+    return model
+
+
+@pytest.fixture(scope="module")
+def keras_model():
+    return build_keras_model()
+
+
+@pytest.mark.parametrize("batch", [1, 8, 32])
+def test_matches_keras_predict(keras_model, batch):
+    fast_model = NumpyGestureModel.from_keras(keras_model)
+    rng = np.random.default_rng(batch)
+    windows = rng.normal(size=(batch, 30, 99)).astype(np.float32)
+
+    expected = keras_model.predict(windows, verbose=0)
+    actual = fast_model.predict(windows)
+
+    assert actual.shape == (batch, 3)
+    np.testing.assert_allclose(actual, expected, atol=TOLERANCE)
+    np.testing.assert_array_equal(actual.argmax(axis=1), expected.argmax(axis=1))
+
+
+def test_benchmark(keras_model, record_property, capsys):
+    result = check_parity_and_benchmark(keras_model, runs=50)
+    for key, value in result.items():
+        record_property(key, value)
+    with capsys.disabled():
+        print(f"\ngesture inference: keras {result['keras_predict_ms']}ms, numpy {result['numpy_ms']}ms per call "
+              f"(max diff {result['max_abs_diff']:.2e})")
+
+    assert result["max_abs_diff"] < TOLERANCE
+    assert result["same_argmax"]
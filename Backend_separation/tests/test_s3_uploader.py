@@ -0,0 +1,131 @@
+# UploadQueue를 moto의 가짜 S3로 확인합니다: 재시작 후 journal 재개, 실패 시 백오프 재시도, MAX_ATTEMPTS 후 failed/ 이동
+import json
+import os
+import time
+
+import pytest
+
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+import s3_uploader  # noqa: E402
+from s3_uploader import UploadQueue  # noqa: E402
+
+BUCKET = "kairos-test"
+
+
+@pytest.fixture
+def s3():
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(s3_uploader, "BACKOFF_BASE", 0.05)
+    monkeypatch.setattr(s3_uploader, "BACKOFF_MAX", 0.2)
+
+
+class FlakyClient:
+    """처음 failures번의 upload_file 호출을 실패시키는 S3 클라이언트 래퍼"""
+
+    def __init__(self, client, failures):
+        self._client = client
+        self.failures = failures
+        self.calls = 0
+
+    def upload_file(self, *args, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("injected failure")
+        return self._client.upload_file(*args, **kwargs)
+
+
+def make_video(directory, name="mom_happy_20241018_120000.mp4"):
+    path = os.path.join(directory, name)
+    with open(path, "wb") as file:
+        file.write(b"video-bytes")
+    return path
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def object_keys(client):
+    return sorted(obj["Key"] for obj in client.list_objects_v2(Bucket=BUCKET).get("Contents", []))
+
+
+def test_upload_removes_local_files_and_journal(s3, tmp_path):
+    uploaded = []
+    queue = UploadQueue(s3, BUCKET, journal_dir=str(tmp_path / "journal"), workers=1,
+                        on_uploaded=lambda key, size: uploaded.append((key, size)))
+    video = make_video(str(tmp_path))
+    queue.enqueue(video, thumbnail_jpeg=b"\xff\xd8thumb")
+
+    assert wait_for(lambda: queue.stats()["uploaded"] == 1)
+    assert object_keys(s3) == ["mom_happy_20241018_120000.mp4", "thumbnail_mom_happy_20241018_120000.jpg"]
+    assert uploaded == [("mom_happy_20241018_120000.mp4", len(b"video-bytes"))]
+    assert not os.path.exists(video)
+    assert [name for name in os.listdir(tmp_path / "journal") if name.endswith(".json")] == []
+
+
+def test_journal_is_replayed_after_restart(s3, tmp_path):
+    journal_dir = str(tmp_path / "journal")
+    # 첫 프로세스: 업로드가 계속 실패하는 상태에서 종료된 것처럼 journal만 남김
+    crashed = UploadQueue(FlakyClient(s3, failures=10 ** 6), BUCKET, journal_dir=journal_dir, workers=1)
+    crashed._write_journal({
+        "id": "pending-job",
+        "video_path": make_video(str(tmp_path)),
+        "video_key": "mom_happy_20241018_120000.mp4",
+        "thumbnail_path": str(tmp_path / "missing.jpg"),
+        "thumbnail_key": "thumbnail_mom_happy_20241018_120000.jpg",
+        "attempts": 2,
+        "created_at": time.time(),
+    })
+
+    # 재시작한 프로세스의 start()가 남은 작업을 이어서 올림
+    restarted = UploadQueue(s3, BUCKET, journal_dir=journal_dir, workers=1)
+    restarted.start()
+
+    assert wait_for(lambda: restarted.stats()["uploaded"] == 1)
+    assert object_keys(s3) == ["mom_happy_20241018_120000.mp4"]
+    assert not os.path.exists(os.path.join(journal_dir, "pending-job.json"))
+
+
+def test_failed_upload_is_retried_with_backoff(s3, tmp_path):
+    client = FlakyClient(s3, failures=2)
+    queue = UploadQueue(client, BUCKET, journal_dir=str(tmp_path / "journal"), workers=1)
+    job = queue.enqueue(make_video(str(tmp_path)), thumbnail_jpeg=b"\xff\xd8thumb")
+
+    assert wait_for(lambda: queue.stats()["uploaded"] == 1)
+    stats = queue.stats()
+    assert stats["retries"] == 2 and stats["failed"] == 0
+    assert "mom_happy_20241018_120000.mp4" in object_keys(s3)
+    assert not os.path.exists(os.path.join(queue.journal_dir, f"{job['id']}.json"))
+
+
+def test_job_moves_to_failed_after_max_attempts(s3, tmp_path, monkeypatch):
+    monkeypatch.setattr(s3_uploader, "MAX_ATTEMPTS", 3)
+    client = FlakyClient(s3, failures=10 ** 6)
+    queue = UploadQueue(client, BUCKET, journal_dir=str(tmp_path / "journal"), workers=1)
+    video = make_video(str(tmp_path))
+    job = queue.enqueue(video, thumbnail_jpeg=b"\xff\xd8thumb")
+
+    assert wait_for(lambda: queue.stats()["failed"] == 1)
+    assert queue.stats()["retries"] == 2  # 3번째 실패에서 재시도를 멈춤
+    assert object_keys(s3) == []
+    failed_path = os.path.join(queue.failed_dir, f"{job['id']}.json")
+    with open(failed_path, "r", encoding="utf-8") as file:
+        record = json.load(file)
+    assert record["attempts"] == s3_uploader.MAX_ATTEMPTS
+    assert record["last_error"] == "injected failure"
+    assert not os.path.exists(os.path.join(queue.journal_dir, f"{job['id']}.json"))
+    assert os.path.exists(video)  # 실패한 영상은 수동 확인을 위해 남겨 둠
@@ -4,61 +4,130 @@
 import asyncio
 import logging
 import cv2
-import numpy as np
-from face_recognition import detect_faces, draw_faces
-from mqtt_client import video_frames
-from hand_gesture_recognition import draw_hand_gesture, hand_gesture_action, hand_gesture_landmarks
+from face_recognition import draw_faces
+from mqtt_client import frame_buffer
+from hand_gesture_recognition import draw_hand_gesture
 
 logger = logging.getLogger(__name__)
 
-import cv2
-import numpy as np
+OVERLAY_INTERVAL = 0.1  # 오버레이 스트림은 최대 10fps로 렌더링
 
-from face_recognition import detect_faces, draw_faces
-from mqtt_client import video_frames
 
-logger = logging.getLogger(__name__)
+def to_multipart(jpeg):
+    return (b'--frame\r\n'
+            b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
 
-async def generate_frames():
-    while True:
-        if len(video_frames) > 0:
-            frame = video_frames[-1]
 
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+class FrameBroadcaster:
+    """
+    오버레이 종류(원본 / 얼굴 / 손 / 얼굴+손)마다 하나씩 존재하며,
+    소스 프레임당 한 번만 그리고 인코딩한 결과를 모든 구독자에게 그대로 나눠줍니다.
+    구독자가 있을 때만 렌더링 태스크가 동작합니다.
+    """
 
-            # 변환된 프레임을 JPEG 형식으로 인코딩
-            success, buffer = cv2.imencode('.jpg', frame)
-            if success:
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
+    def __init__(self, face=False, hand=False):
+        self.face = face
+        self.hand = hand
+        self.seq = 0  # 마지막으로 발행한 소스 프레임 번호
+        self.payload = None  # multipart 청크로 인코딩된 최신 프레임
+        self._subscribers = 0
+        self._task = None
+        self._waiter = None
 
-        await asyncio.sleep(0.1)  # 프레임을 가져오는 간격 조절
+    @property
+    def is_raw(self):
+        return not (self.face or self.hand)
 
+    def render(self, seq):
+        """소스 프레임 하나를 이 스트림의 JPEG 바이트로 변환합니다."""
+        if self.is_raw:
+            # 로봇이 보낸 JPEG를 디코딩/재인코딩 없이 그대로 전달
+            jpeg = frame_buffer.get_jpeg(seq)
+            if jpeg is not None:
+                return jpeg
 
-async def video_frame_generator(face=True, hand=True):
-    while True:
-        if len(video_frames) > 0:
-            frame = video_frames[-1].copy()  # 프레임 복사
-
-            if frame is None or not isinstance(frame, np.ndarray):
-                logging.error("Invalid frame received.")
-                await asyncio.sleep(0.05)
-                continue
-
-            if face:
-                frame = draw_faces(frame) 
-            if hand:
-                frame, action, landmarks = draw_hand_gesture(frame)
-                if action != '?':
-                    cv2.putText(frame, f'Action: {action}', (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-                logging.info(f"Detected hand action: {action}")
-
-            success, buffer = cv2.imencode('.jpg', frame)
-            if success:
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
-            await asyncio.sleep(0.1)
-        else:
-            logging.warning("No frames available, sleeping...")
-            await asyncio.sleep(0.1)
+        frame = frame_buffer.get(seq, copy=not self.is_raw)  # 오버레이를 그릴 때만 복사
+        if frame is None:
+            return None
+
+        if self.face:
+            frame = draw_faces(frame)
+        if self.hand:
+            frame, action, landmarks = draw_hand_gesture(frame, seq)
+            if action != '?':
+                cv2.putText(frame, f'Action: {action}', (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+            logging.info(f"Detected hand action: {action}")
+
+        success, buffer = cv2.imencode('.jpg', frame)
+        return buffer.tobytes() if success else None
+
+    async def _run(self):
+        last_seq = 0
+        try:
+            while self._subscribers > 0:
+                try:
+                    last_seq = await frame_buffer.wait_seq(last_seq, timeout=1.0)
+                except asyncio.TimeoutError:
+                    continue
+
+                try:
+                    # 오버레이 그리기(MediaPipe 포함)와 JPEG 인코딩은 이벤트 루프 밖에서 실행
+                    jpeg = await asyncio.get_running_loop().run_in_executor(None, self.render, last_seq)
+                except Exception:
+                    # 프레임 하나를 그리다 실패해도 공유 스트림 전체가 멈추지 않도록 건너뜀
+                    logger.exception(f"오버레이 렌더링 중 오류 발생: face={self.face}, hand={self.hand}")
+                    continue
+                if jpeg is None:
+                    continue
+                self.payload = to_multipart(jpeg)
+                self.seq = last_seq
+                if self._waiter is not None and not self._waiter.done():
+                    self._waiter.set_result(last_seq)
+                self._waiter = None
+
+                if not self.is_raw:
+                    await asyncio.sleep(OVERLAY_INTERVAL)
+        except BaseException as e:
+            # 태스크가 끝나면 기다리던 구독자를 깨워서 영원히 멈춰 있지 않게 함
+            if self._waiter is not None and not self._waiter.done():
+                self._waiter.set_exception(e if isinstance(e, Exception) else ConnectionError("stream stopped"))
+            self._waiter = None
+            raise
+        finally:
+            self._task = None
 
+    def _ensure_task(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def subscribe(self):
+        """새로 발행되는 프레임을 순서대로 내보내는 비동기 제너레이터 (느린 구독자는 중간 프레임을 건너뜀)"""
+        self._subscribers += 1
+        self._ensure_task()
+        try:
+            # 구독 시점에 캐시된 프레임은 오래됐을 수 있으므로 그 이후에 발행된 프레임부터 보냄
+            last_seq = self.seq
+            while True:
+                while self.seq <= last_seq:
+                    if self._waiter is None or self._waiter.done():
+                        self._ensure_task()  # 렌더링 태스크가 끝났으면 다시 시작
+                        self._waiter = asyncio.get_running_loop().create_future()
+                    await asyncio.shield(self._waiter)
+                last_seq = self.seq
+                yield self.payload
+        finally:
+            self._subscribers -= 1
+
+
+# (face, hand) 조합별 공유 스트림
+broadcasters = {(face, hand): FrameBroadcaster(face, hand) for face in (False, True) for hand in (False, True)}
+
+
+async def generate_frames():
+    async for chunk in broadcasters[(False, False)].subscribe():
+        yield chunk
+
+
+async def video_frame_generator(face=True, hand=True):
+    async for chunk in broadcasters[(bool(face), bool(hand))].subscribe():
+        yield chunk
@@ -6,12 +6,17 @@ import jwt_decode from 'jwt-decode'; // jwt-decode 라이브러리 추가
 
 const WEBSOCKET_URL = "ws://localhost:8000/ws/chat"; // WebSocket 주소
 const MESSAGE_API_URL = "http://localhost:8000/messages"; // 메시지를 가져오는 API URL
+const PAGE_SIZE = 50; // 한 번에 불러오는 메시지 수
 
 export default function Chat() {
   const [message, setMessage] = useState('');
   const [messages, setMessages] = useState([]);
+  const [beforeCursor, setBeforeCursor] = useState(null); // 가장 오래된 메시지 ID (이전 페이지 커서)
+  const [hasMore, setHasMore] = useState(false);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const websocketRef = useRef(null);
   const flatListRef = useRef(null); // FlatList reference 추가
+  const prependingRef = useRef(false); // 이전 페이지를 앞에 붙이는 중에는 자동 스크롤하지 않음
 
   useEffect(() => {
     const fetchMessages = async () => {
@@ -19,14 +24,13 @@ export default function Chat() {
       const username = getUsernameFromToken(accessToken); // JWT에서 username 가져오기
 
       try {
-        const response = await fetch(`${MESSAGE_API_URL}/${username}`);
+        // 전체 기록 대신 가장 최근 페이지만 요청
+        const response = await fetch(`${MESSAGE_API_URL}/${username}?limit=${PAGE_SIZE}`);
         const data = await response.json();
         if (data.messages) {
-          const formattedMessages = data.messages.map(msg => ({
-            text: msg.message,
-            isUser: false // 서버에서 온 메시지로 표시
-          }));
-          setMessages(formattedMessages); // 초기 메시지를 설정
+          setMessages(formatMessages(data.messages)); // 초기 메시지를 설정
+          setBeforeCursor(data.before);
+          setHasMore(data.has_more);
 
           // 메시지를 불러온 후 스크롤을 가장 아래로 내리기
           setTimeout(() => {
@@ -84,11 +88,42 @@ export default function Chat() {
 
   useEffect(() => {
     // messages가 변경될 때마다 스크롤을 가장 아래로 내리기
+    if (prependingRef.current) {
+      prependingRef.current = false;
+      return;
+    }
     if (flatListRef.current) {
       flatListRef.current.scrollToEnd({ animated: true });
     }
   }, [messages]); // messages가 변경될 때마다 실행
 
+  const formatMessages = (serverMessages) => serverMessages.map(msg => ({
+    text: msg.message,
+    isUser: false // 서버에서 온 메시지로 표시
+  }));
+
+  // 목록 맨 위에서 당기면 이전 페이지를 불러와 앞에 붙임
+  const loadOlderMessages = async () => {
+    if (!hasMore || loadingOlder) return;
+    setLoadingOlder(true);
+    try {
+      const accessToken = await AsyncStorage.getItem('token');
+      const username = getUsernameFromToken(accessToken);
+      const response = await fetch(`${MESSAGE_API_URL}/${username}?limit=${PAGE_SIZE}&before=${beforeCursor}`);
+      const data = await response.json();
+      if (data.messages) {
+        prependingRef.current = true;
+        setMessages((prevMessages) => [...formatMessages(data.messages), ...prevMessages]);
+        setBeforeCursor(data.before);
+        setHasMore(data.has_more);
+      }
+    } catch (error) {
+      console.error("이전 메시지 로드 오류:", error);
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
   const getUsernameFromToken = (token) => {
     try {
       console.log("Received token:", token); // 토큰 로그
@@ -136,6 +171,8 @@ export default function Chat() {
             </MessageContainer>
           )}
           inverted={false} // inverted를 false로 설정
+          refreshing={loadingOlder}
+          onRefresh={loadOlderMessages} // 맨 위에서 당기면 이전 메시지 로드
           contentContainerStyle={{ paddingVertical: 16 }}
           bounces={true}
           showsVerticalScrollIndicator={false}
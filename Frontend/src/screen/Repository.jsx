@@ -1,37 +1,63 @@
-import React, { useEffect, useState } from 'react';
-import { View, Text, ActivityIndicator, ScrollView, TouchableOpacity, Alert } from 'react-native';
+import React, { useCallback, useEffect, useState } from 'react';
+import { View, Text, ActivityIndicator, FlatList, TouchableOpacity, Alert } from 'react-native';
 import styled from 'styled-components/native';
 import * as FileSystem from 'expo-file-system';
 import * as Sharing from 'expo-sharing';
 
+const PAGE_SIZE = 20;
+
 export default function Repository() {
   const [data, setData] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
   const [error, setError] = useState(null);
 
+  // 한 페이지씩 불러오기 (cursor가 없으면 첫 페이지)
+  const fetchPage = async (cursor) => {
+    const params = `limit=${PAGE_SIZE}` + (cursor ? `&cursor=${encodeURIComponent(cursor)}` : '');
+    const response = await fetch(`http://localhost:8000/s3_video_list?${params}`);
+    if (!response.ok) {
+      throw new Error('네트워크 응답이 좋지 않습니다.');
+    }
+    return response.json();
+  };
+
   useEffect(() => {
     const fetchData = async () => {
       try {
         console.log('데이터 로딩 시작...');
-        const response = await fetch('http://localhost:8000/s3_video_list');
-        if (!response.ok) {
-          throw new Error('네트워크 응답이 좋지 않습니다.');
-        }
-        const json = await response.json();
-        console.log('데이터 로딩 완료:', json.videos);
+        const json = await fetchPage(null);
+        console.log('데이터 로딩 완료:', json.videos.length);
         setData(json.videos);
+        setNextCursor(json.next_cursor);
       } catch (error) {
         console.error('데이터 로딩 중 오류 발생:', error.message);
         setError(error.message);
       } finally {
         setLoading(false);
-        console.log('로딩 상태 업데이트:', loading);
       }
     };
 
     fetchData();
   }, []);
 
+  const loadMore = useCallback(async () => {
+    if (!nextCursor || loadingMore) {
+      return;
+    }
+    setLoadingMore(true);
+    try {
+      const json = await fetchPage(nextCursor);
+      setData(prev => prev.concat(json.videos));
+      setNextCursor(json.next_cursor);
+    } catch (error) {
+      console.error('다음 페이지 로딩 중 오류 발생:', error.message);
+    } finally {
+      setLoadingMore(false);
+    }
+  }, [nextCursor, loadingMore]);
+
   const handleButtonPress = async (item) => {
     console.log(`다운로드 버튼 클릭: ${item.file_name}`);
 
@@ -79,12 +105,16 @@ export default function Repository() {
   return (
     <Container>
       <Title>하이라이트 저장소</Title>
-      <ScrollView
+      <FlatList
         style={{ flex: 1 }}
+        data={data}
+        keyExtractor={item => item.file_name}
         showsVerticalScrollIndicator={false}
-      >
-        {data.map(item => (
-          <Item key={item.file_name}>
+        onEndReached={loadMore}
+        onEndReachedThreshold={0.5}
+        ListFooterComponent={loadingMore ? <ActivityIndicator size="small" color="#FFFFFF" /> : null}
+        renderItem={({ item }) => (
+          <Item>
             <ItemTitle>{item.person_name}의 {item.emotion}</ItemTitle>
             <ItemText>{item.date_time}</ItemText>
             <Thumbnail source={{ uri: item.thumbnail_url }} />
@@ -92,8 +122,8 @@ export default function Repository() {
               <ButtonText>다운로드</ButtonText>
             </Button>
           </Item>
-        ))}
-      </ScrollView>
+        )}
+      />
     </Container>
   );
 };
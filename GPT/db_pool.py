@@ -0,0 +1,160 @@
+# db_pool.py
+# 백엔드 모듈과 GPT 일정 헬퍼가 함께 쓰는 MySQL 커넥션 풀
+#
+# Backend_separation/db_pool.py와 GPT/db_pool.py는 따로 배포되는 같은 파일입니다.
+# 한쪽을 고치면 다른 쪽에도 그대로 복사해서 두 프로세스의 풀 동작과 통계가 같도록 유지합니다.
+#
+# 요청마다 pymysql.connect()로 TCP 연결과 인증을 반복하지 않도록 연결을 재사용합니다.
+# 동기 함수(fetchone/fetchall/execute)는 스레드에서, 비동기 함수(afetchone/...)는
+# 이벤트 루프에서 호출하며 비동기 쪽은 풀 크기만큼의 전용 스레드에서 쿼리를 실행합니다.
+
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pymysql
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+ACQUIRE_TIMEOUT = 10.0  # 풀이 모두 사용 중일 때 기다리는 최대 시간
+HEALTH_CHECK_INTERVAL = 30.0  # 이 시간 이상 쉬었던 연결은 꺼내기 전에 ping
+TIMING_WINDOW = 100
+
+
+class ConnectionPool:
+    def __init__(self, max_size=POOL_SIZE, **connect_kwargs):
+        self.max_size = max_size
+        self._connect_kwargs = connect_kwargs
+        self._idle = queue.LifoQueue()  # (connection, 마지막 사용 시각)
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._executor = ThreadPoolExecutor(max_workers=max_size, thread_name_prefix="db")
+        self._timings = {}
+        self._timings_lock = threading.Lock()
+        self.created = 0
+
+    # ---------------------------------------------------------------- 연결 관리
+    def _connect(self):
+        self.created += 1
+        return pymysql.connect(autocommit=False, **self._connect_kwargs)
+
+    @contextmanager
+    def connection(self):
+        """풀에서 연결 하나를 빌려 사용하고, 끝나면 돌려놓습니다."""
+        if not self._slots.acquire(timeout=ACQUIRE_TIMEOUT):
+            raise TimeoutError("DB 커넥션 풀에서 연결을 얻지 못했습니다.")
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+            conn.commit()
+            self._idle.put((conn, time.monotonic()))
+        except Exception:
+            if conn is not None:
+                self._discard(conn)
+            raise
+        finally:
+            self._slots.release()
+
+    def _checkout(self):
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - last_used < HEALTH_CHECK_INTERVAL:
+                return conn
+            try:
+                conn.ping(reconnect=True)  # 오래 쉰 연결은 끊겼을 수 있으므로 확인
+                return conn
+            except Exception as e:
+                logger.warning(f"DB 연결 상태 확인 실패, 폐기합니다: {e}")
+                self._discard(conn)
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.rollback()
+            conn.close()
+        except Exception:
+            pass
+
+    # ---------------------------------------------------------------- 쿼리
+    def _run(self, name, query, params, fetch, dict_rows):
+        start = time.perf_counter()
+        try:
+            with self.connection() as conn:
+                cursor_class = pymysql.cursors.DictCursor if dict_rows else pymysql.cursors.Cursor
+                with conn.cursor(cursor_class) as cursor:
+                    cursor.execute(query, params)
+                    if fetch == 'one':
+                        return cursor.fetchone()
+                    if fetch == 'all':
+                        return cursor.fetchall()
+                    return cursor.rowcount
+        finally:
+            self._record(name or query.split()[0].upper(), time.perf_counter() - start)
+
+    def fetchone(self, query, params=None, dict_rows=False, name=None):
+        return self._run(name, query, params, 'one', dict_rows)
+
+    def fetchall(self, query, params=None, dict_rows=False, name=None):
+        return self._run(name, query, params, 'all', dict_rows)
+
+    def execute(self, query, params=None, name=None):
+        """INSERT/UPDATE/DELETE 실행 후 커밋하고 영향받은 행 수를 반환합니다."""
+        return self._run(name, query, params, None, False)
+
+    async def afetchone(self, query, params=None, dict_rows=False, name=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._run, name, query, params, 'one', dict_rows)
+
+    async def afetchall(self, query, params=None, dict_rows=False, name=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._run, name, query, params, 'all', dict_rows)
+
+    async def aexecute(self, query, params=None, name=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._run, name, query, params, None, False)
+
+    # ---------------------------------------------------------------- 상태
+    def _record(self, name, seconds):
+        with self._timings_lock:
+            if name not in self._timings:
+                self._timings[name] = deque(maxlen=TIMING_WINDOW)
+            self._timings[name].append(seconds)
+
+    def stats(self):
+        with self._timings_lock:
+            queries = {
+                name: {
+                    "count": len(samples),
+                    "avg_ms": round(sum(samples) / len(samples) * 1000, 2),
+                    "max_ms": round(max(samples) * 1000, 2),
+                }
+                for name, samples in self._timings.items() if samples
+            }
+        return {
+            "max_size": self.max_size,
+            "idle": self._idle.qsize(),
+            "created": self.created,
+            "queries": queries,
+        }
+
+
+db_pool = ConnectionPool(
+    host=os.getenv('DB_HOST'),
+    user=os.getenv('DB_USER'),
+    password=os.getenv('DB_PASSWORD'),
+    database=os.getenv('DB_NAME'),
+    charset='utf8mb4',
+)